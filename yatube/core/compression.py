@@ -0,0 +1,123 @@
+import gzip
+import re
+import zlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import decorator_from_middleware
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Меньше этого сжатие не окупает заголовков и работы процессора
+MIN_SIZE = 200
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/atom+xml',
+    'image/svg+xml',
+)
+
+TOKEN_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q=([\d.]+))?')
+ETAG_SUFFIX_RE = re.compile(r';(?:gzip|br)"')
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме явно запрещенных q=0."""
+    encodings = set()
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for part in header.split(','):
+        match = TOKEN_RE.match(part)
+        if match and float(match[2] or 1) > 0:
+            encodings.add(match[1].lower())
+    return encodings
+
+
+def choose_encoding(request):
+    """br, если клиент и сервер его умеют, иначе gzip или ничего."""
+    encodings = accepted_encodings(request)
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """
+    Сжатие потокового ответа: каждая часть сбрасывается сразу,
+    чтобы шапка страницы не ждала в буфере компрессора.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').lower()
+    return (
+        response.status_code == 200
+        and not response.has_header('Content-Encoding')
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    gzip или brotli для текстовых ответов. Под cache_page (декоратор
+    compress_page) в кеш попадают уже сжатые байты с Vary:
+    Accept-Encoding, и попадание в кеш больше ничего не сжимает.
+    К ETag сжатого ответа дописывается ;<кодировка>, а из
+    If-None-Match она убирается, чтобы view сравнивали свои ETag.
+    """
+    def process_request(self, request):
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if header:
+            request.META['HTTP_IF_NONE_MATCH'] = ETAG_SUFFIX_RE.sub(
+                '"', header)
+
+    def process_response(self, request, response):
+        if not is_compressible(response):
+            return response
+        if not response.streaming and len(response.content) < MIN_SIZE:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(
+                r'"$', f';{encoding}"', response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
+
+
+compress_page = decorator_from_middleware(CompressionMiddleware)
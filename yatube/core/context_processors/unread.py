@@ -0,0 +1,25 @@
+from django.utils.functional import SimpleLazyObject
+from posts.models import FeedCursor
+
+UNREAD_LIMIT = 99
+
+
+def unread_label(user):
+    if not user.is_authenticated:
+        return ''
+    unread = FeedCursor.objects.filter(user=user).values_list(
+        'unread', flat=True).first()
+    if not unread:
+        return ''
+    return f'{UNREAD_LIMIT}+' if unread > UNREAD_LIMIT else str(unread)
+
+
+def unread(request):
+    """
+    Непрочитанные посты подписок для шапки. Запрос выполняется,
+    только если шаблон выводит значение: публичным страницам
+    и анонимам он не стоит ничего.
+    """
+    return {
+        'unread': SimpleLazyObject(lambda: unread_label(request.user))
+    }
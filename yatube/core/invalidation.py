@@ -0,0 +1,28 @@
+import os
+
+from django.conf import settings
+
+# Метка растет на байт при каждом изменении: так версия меняется,
+# даже если mtime не успел сдвинуться
+MAX_STAMP_SIZE = 4096
+
+
+def version_path(name):
+    return os.path.join(settings.INVALIDATION_DIR, name)
+
+
+def bump(name):
+    """Сообщает всем процессам, что данные name изменились."""
+    os.makedirs(settings.INVALIDATION_DIR, exist_ok=True)
+    with open(version_path(name), 'ab') as stamp:
+        if stamp.tell() >= MAX_STAMP_SIZE:
+            stamp.truncate(0)
+        stamp.write(b'.')
+
+
+def version(name):
+    try:
+        stat = os.stat(version_path(name))
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
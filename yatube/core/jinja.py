@@ -0,0 +1,44 @@
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from jinja2 import Environment, Undefined
+from markupsafe import Markup
+from core.templatetags.user_filters import addclass
+from posts.templatetags.post_images import image_context
+
+
+def url(view_name, *args, **kwargs):
+    return reverse(view_name, args=args or None, kwargs=kwargs or None)
+
+
+def date(value, arg=None):
+    # Как у фильтра date в Django: время сначала переводится в локальное
+    return defaultfilters.date(template_localtime(value), arg)
+
+
+def environment(**options):
+    """
+    Окружение Jinja2 для горячих страниц лент и поста (jinja2/).
+    Глобальные функции и фильтры повторяют теги Django-шаблонов,
+    чтобы вывод совпадал байт в байт с точностью до пробелов.
+    """
+    # DebugUndefined печатает имя пропущенной переменной, Django - пусто
+    options['undefined'] = Undefined
+    env = Environment(**options)
+
+    def post_image(post, lazy=True):
+        template = env.get_template('posts/includes/post_image.html')
+        return Markup(template.render(image_context(post, lazy)))
+
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'post_image': post_image,
+    })
+    env.filters.update({
+        'addclass': addclass,
+        'date': date,
+        'escapejs': defaultfilters.escapejs_filter,
+    })
+    return env
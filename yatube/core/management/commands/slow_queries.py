@@ -0,0 +1,53 @@
+import glob
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Сводка медленных запросов по формам, отсортированная по времени'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def read_entries(self, path):
+        for name in sorted(glob.glob(f'{path}*')):
+            with open(name, encoding='utf-8') as log_file:
+                for line in log_file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def handle(self, *args, **options):
+        shapes = {}
+        for entry in self.read_entries(options['file']):
+            shape = shapes.setdefault(entry['shape_id'], {
+                'shape': entry['shape'],
+                'count': 0,
+                'total_ms': 0,
+                'max_ms': 0,
+                'views': set(),
+                'plan': entry['plan'],
+            })
+            shape['count'] += 1
+            shape['total_ms'] += entry['duration_ms']
+            shape['max_ms'] = max(shape['max_ms'], entry['duration_ms'])
+            shape['views'].add(entry['view'] or '-')
+        top = sorted(
+            shapes.items(), key=lambda item: item[1]['total_ms'], reverse=True
+        )[:options['limit']]
+        for shape_id, shape in top:
+            self.stdout.write(
+                f'{shape_id}  всего {shape["total_ms"]:.1f} мс, '
+                f'запросов {shape["count"]}, '
+                f'среднее {shape["total_ms"] / shape["count"]:.1f} мс, '
+                f'максимум {shape["max_ms"]:.1f} мс'
+            )
+            self.stdout.write(f'  {shape["shape"]}')
+            views = ', '.join(sorted(shape['views']))
+            self.stdout.write(f'  страницы: {views}')
+            for row in shape['plan']:
+                self.stdout.write(f'    {row}')
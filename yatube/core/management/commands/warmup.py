@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогрев процесса: шаблоны, адреса, реестры, главная '
+        'и крупные группы в кеше'
+    )
+
+    def handle(self, *args, **options):
+        for name, summary, seconds in warm_up():
+            self.stdout.write(f'{name}: {summary}, {seconds * 1000:.1f} мс')
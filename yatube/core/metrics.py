@@ -0,0 +1,205 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from sorl.thumbnail.base import ThumbnailBackend
+
+MISSING = object()
+
+
+class Registry:
+    """
+    Метрики процесса. Раз в METRICS_FLUSH_INTERVAL секунд пишутся
+    в METRICS_DIR/<pid>.json, эндпоинт /metrics складывает файлы
+    всех воркеров.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = 0
+
+    def ensure_process(self):
+        # После fork метрики родителя не должны попасть в файл потомка
+        if self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.counters, self.histograms = {}, {}
+        previous = read_file(self.path())
+        if previous:
+            merge(self, previous)
+
+    def path(self):
+        return os.path.join(settings.METRICS_DIR, f'{self.pid}.json')
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.ensure_process()
+            key = (name, tuple(sorted(labels.items())))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            self.ensure_process()
+            key = (name, tuple(sorted(labels.items())))
+            buckets = self.histograms.setdefault(
+                key, [0] * (len(settings.METRICS_BUCKETS) + 1) + [0.0])
+            buckets[bisect.bisect_left(settings.METRICS_BUCKETS, value)] += 1
+            buckets[-1] += value
+
+    def dump(self):
+        return {
+            'counters': [
+                [name, dict(labels), value]
+                for (name, labels), value in self.counters.items()
+            ],
+            'histograms': [
+                [name, dict(labels), buckets]
+                for (name, labels), buckets in self.histograms.items()
+            ],
+        }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            interval = now - self.flushed
+            if not force and interval < settings.METRICS_FLUSH_INTERVAL:
+                return
+            self.ensure_process()
+            data = self.dump()
+            self.flushed = now
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        # Свой временный файл у каждого потока: записи не перемешаются
+        tmp_path = f'{self.path()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as tmp_file:
+            json.dump(data, tmp_file)
+        os.replace(tmp_path, self.path())
+
+
+registry = Registry()
+
+
+def read_file(path):
+    try:
+        with open(path) as metrics_file:
+            return json.load(metrics_file)
+    except (OSError, ValueError):
+        return None
+
+
+def merge(target, data):
+    for name, labels, value in data['counters']:
+        key = (name, tuple(sorted(labels.items())))
+        target.counters[key] = target.counters.get(key, 0) + value
+    for name, labels, buckets in data['histograms']:
+        key = (name, tuple(sorted(labels.items())))
+        current = target.histograms.get(key)
+        if current is None:
+            target.histograms[key] = list(buckets)
+        else:
+            target.histograms[key] = [a + b for a, b in zip(current, buckets)]
+
+
+def collect():
+    registry.flush(force=True)
+    total = Registry()
+    for name in os.listdir(settings.METRICS_DIR):
+        if name.endswith('.json'):
+            data = read_file(os.path.join(settings.METRICS_DIR, name))
+            if data:
+                merge(total, data)
+    return total
+
+
+def format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('"', '\\"'))
+        for key, value in items
+    )
+    return '{' + pairs + '}'
+
+
+def render(total):
+    lines = []
+    for name in sorted({name for name, _ in total.counters}):
+        lines.append(f'# TYPE {name} counter')
+        for (key_name, labels), value in sorted(total.counters.items()):
+            if key_name == name:
+                lines.append(f'{name}{format_labels(labels)} {value}')
+    for name in sorted({name for name, _ in total.histograms}):
+        lines.append(f'# TYPE {name} histogram')
+        for (key_name, labels), buckets in sorted(total.histograms.items()):
+            if key_name != name:
+                continue
+            cumulative = 0
+            bounds = list(settings.METRICS_BUCKETS) + ['+Inf']
+            for bound, count in zip(bounds, buckets):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(labels, le=bound), cumulative))
+            lines.append(f'{name}_sum{format_labels(labels)} {buckets[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = {'count': 0, 'time': 0.0}
+
+        def count_queries(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries['count'] += 1
+                queries['time'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else ''
+        if view.split(':')[0] in settings.METRICS_NAMESPACES:
+            labels = {'view': view}
+            registry.observe(
+                'yatube_request_duration_seconds', labels, duration)
+            registry.inc('yatube_db_queries_total', labels, queries['count'])
+            registry.inc(
+                'yatube_db_query_seconds_total', labels, queries['time'])
+        registry.inc(
+            'yatube_responses_total', {'status': response.status_code})
+        registry.flush()
+        return response
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        result = 'miss' if value is MISSING else 'hit'
+        registry.inc('yatube_cache_requests_total', {'result': result})
+        return default if value is MISSING else value
+
+
+class TimedThumbnailBackend(ThumbnailBackend):
+    def _create_thumbnail(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super()._create_thumbnail(*args, **kwargs)
+        finally:
+            registry.observe(
+                'yatube_thumbnail_seconds', {},
+                time.perf_counter() - started
+            )
@@ -0,0 +1,83 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+PROFILE_NAME_RE = re.compile(
+    r'^(?P<stamp>\d+)_(?P<url_name>[\w.-]+)_(?P<ms>\d+)ms\.prof$')
+
+
+def profile_path(name):
+    return os.path.join(settings.PROFILING_DIR, name)
+
+
+def list_profiles():
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(settings.PROFILING_DIR):
+        match = PROFILE_NAME_RE.match(name)
+        if match:
+            profiles.append({
+                'name': name,
+                'created': datetime.fromtimestamp(
+                    int(match['stamp']) / 10 ** 9, tz=timezone.utc),
+                'url_name': match['url_name'].replace('-', ':', 1),
+                'ms': int(match['ms']),
+            })
+    return sorted(profiles, key=lambda item: item['created'], reverse=True)
+
+
+def save_profile(profiler, url_name, duration):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    name = '{}_{}_{}ms.prof'.format(
+        time.time_ns(),
+        re.sub(r'[^\w.-]', '-', url_name or 'unknown'),
+        round(duration * 1000)
+    )
+    profiler.dump_stats(profile_path(name))
+    for old in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        try:
+            os.remove(profile_path(old['name']))
+        except FileNotFoundError:
+            # Этот профиль уже удалил другой воркер
+            pass
+    return name
+
+
+def profile_report(name, limit=60):
+    stream = io.StringIO()
+    stats = pstats.Stats(profile_path(name), stream=stream)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    Снимает cProfile с обработки запроса: по параметру ?profile
+    для сотрудников и для случайной доли PROFILING_SAMPLE_RATE запросов.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if settings.PROFILING_PARAM in request.GET:
+            return request.user.is_staff
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        save_profile(profiler, match.view_name if match else None, duration)
+        return response
@@ -0,0 +1,106 @@
+import fcntl
+import hashlib
+import math
+import os
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.shortcuts import render
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def bucket_path(key):
+    name = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(settings.RATELIMIT_DIR, name)
+
+
+def take_token(key, limit, period):
+    """
+    Корзина на limit токенов, которая наполняется равномерно:
+    limit токенов за period секунд. Число токенов и время последнего
+    обновления лежат в файле RATELIMIT_DIR и меняются под flock,
+    поэтому лимит общий для всех потоков и воркеров.
+    """
+    os.makedirs(settings.RATELIMIT_DIR, exist_ok=True)
+    descriptor = os.open(bucket_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+    with open(descriptor, 'r+') as bucket:
+        # Блокировка снимается при закрытии файла, уже после записи
+        fcntl.flock(bucket, fcntl.LOCK_EX)
+        now = time.time()
+        try:
+            tokens, updated = map(float, bucket.read().split())
+        except ValueError:
+            tokens, updated = limit, now
+        elapsed = max(now - updated, 0)
+        tokens = min(limit, tokens + elapsed * limit / period)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        bucket.seek(0)
+        bucket.truncate()
+        bucket.write(f'{tokens} {now}')
+    return allowed
+
+
+def identities(request):
+    yield f'ip:{request.META.get("REMOTE_ADDR", "")}'
+    if request.user.is_authenticated:
+        yield f'user:{request.user.pk}'
+
+
+def is_limited(request, scope, rate):
+    limit, period = parse_rate(rate)
+    results = [
+        take_token(f'{scope}:{identity}', limit, period)
+        for identity in identities(request)
+    ]
+    return not all(results)
+
+
+def too_many_requests(request, rate):
+    limit, period = parse_rate(rate)
+    # Через столько секунд в корзине снова появится токен
+    retry_after = math.ceil(period / limit)
+    response = render(
+        request, 'core/429.html', {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(rate, methods=('POST',), scope=None):
+    def decorator(view_func):
+        view_scope = scope or f'{view_func.__module__}.{view_func.__name__}'
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods and is_limited(
+                    request, view_scope, rate):
+                return too_many_requests(request, rate)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Ограничения из RATELIMITS по имени url: (частота, методы)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        if view_name not in settings.RATELIMITS:
+            return None
+        rate, methods = settings.RATELIMITS[view_name]
+        if request.method in methods and is_limited(request, view_name, rate):
+            return too_many_requests(request, rate)
+        return None
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('yatube.slow_queries')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+IN_LIST_RE = re.compile(r'IN \((?:\?, )*\?\)')
+SPACES_RE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Форма запроса: литералы и списки IN заменены на ?."""
+    shape = STRING_RE.sub('?', sql)
+    shape = NUMBER_RE.sub('?', shape)
+    shape = PLACEHOLDER_RE.sub('?', shape)
+    shape = SPACES_RE.sub(' ', shape).strip()
+    return IN_LIST_RE.sub('IN (...)', shape)
+
+
+def fingerprint(value):
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:12]
+
+
+class SlowQueryLogger:
+    """
+    execute_wrapper, который пишет в лог запросы дольше
+    SLOW_QUERY_THRESHOLD секунд вместе с планом выполнения.
+    """
+    def __init__(self, request=None):
+        self.request = request
+        self.local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self.local, 'explaining', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= settings.SLOW_QUERY_THRESHOLD:
+                self.log(sql, params, many, duration)
+
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else ''
+
+    def explain(self, sql, params):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return []
+        prefix = (
+            'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite'
+            else 'EXPLAIN'
+        )
+        self.local.explaining = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                return [
+                    ' '.join(str(column) for column in row)
+                    for row in cursor.fetchall()
+                ]
+        except Exception as error:
+            return [f'EXPLAIN failed: {error}']
+        finally:
+            self.local.explaining = False
+
+    def log(self, sql, params, many, duration):
+        shape = normalize(sql)
+        entry = {
+            'time': time.time(),
+            'shape_id': fingerprint(shape),
+            'shape': shape,
+            'sql': sql,
+            'params': fingerprint(params),
+            'duration_ms': round(duration * 1000, 3),
+            'view': self.view_name(),
+            'plan': [] if many else self.explain(sql, params),
+        }
+        logger.warning(json.dumps(entry, ensure_ascii=False))
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with connection.execute_wrapper(SlowQueryLogger(request)):
+            return self.get_response(request)
@@ -0,0 +1,57 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from core.compression import MIN_SIZE, brotli
+
+# Расширения сжатых копий и чем их получить
+COMPRESSORS = {'.gz': lambda data: gzip.compress(data, 9, mtime=0)}
+if brotli is not None:
+    COMPRESSORS['.br'] = lambda data: brotli.compress(data, quality=11)
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.svg', '.txt', '.xml', '.json', '.html', '.ico', '.map',
+)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic пишет файлы с хешем содержимого в имени и рядом
+    с каждым текстовым файлом - .gz и .br (если установлен brotli),
+    сжатые один раз на максимальном уровне. Такие имена никогда не
+    меняют содержимое и отдаются с кешированием на год.
+    """
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic еще не запускался: отдаем исходное имя
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            for extension in self.compress(name):
+                yield name, f'{name}{extension}', True
+
+    def compress(self, name):
+        """Сжатые копии name, если они хотя бы на 5% меньше оригинала."""
+        if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < MIN_SIZE:
+            return
+        for extension, compressor in COMPRESSORS.items():
+            compressed = compressor(data)
+            if len(compressed) > len(data) * 0.95:
+                continue
+            path = self.path(f'{name}{extension}')
+            with open(path, 'wb') as target:
+                target.write(compressed)
+            yield extension
+
+    def is_immutable(self, name):
+        """Имя с хешем из манифеста: содержимое под ним не меняется."""
+        return name in self.hashed_files.values()
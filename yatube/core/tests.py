@@ -1,5 +1,27 @@
+import cProfile
+import gzip
+import json
+import threading
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
 from http import HTTPStatus
+from core import compression, warmup
+from core.metrics import Registry, read_file
+from core.profiling import list_profiles, save_profile
+from core.ratelimit import take_token
+from posts.models import Group, Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -10,3 +32,297 @@ class ViewTestClass(TestCase):
     def test_error_templates_page(self):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        self.profiling_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiling_dir, True)
+
+    def test_staff_request_is_profiled(self):
+        """Запрос сотрудника с ?profile сохраняет профиль"""
+        with self.settings(PROFILING_DIR=self.profiling_dir):
+            self.client.force_login(ProfilingTests.staff)
+            self.client.get(reverse('posts:follow_index') + '?profile')
+            profiles = list_profiles()
+            self.assertEqual(len(profiles), 1)
+            self.assertEqual(profiles[0]['url_name'], 'posts:follow_index')
+            response = self.client.get(reverse('core:profiles'))
+            self.assertContains(response, profiles[0]['name'])
+            response = self.client.get(reverse(
+                'core:profile_detail', args=(profiles[0]['name'],)))
+            self.assertContains(response, 'cumulative')
+
+    def test_user_request_is_not_profiled(self):
+        """Обычный пользователь не может включить профилирование"""
+        with self.settings(PROFILING_DIR=self.profiling_dir):
+            self.client.force_login(ProfilingTests.user)
+            self.client.get(reverse('posts:follow_index') + '?profile')
+            self.assertEqual(list_profiles(), [])
+
+    def test_profile_pruned_by_other_worker(self):
+        """Профиль, уже удаленный другим воркером, не ломает запрос"""
+        gone = [{'name': '1_posts-index_1ms.prof'}]
+        with self.settings(
+                PROFILING_DIR=self.profiling_dir, PROFILING_MAX_FILES=0):
+            with mock.patch(
+                    'core.profiling.list_profiles', return_value=gone):
+                name = save_profile(cProfile.Profile(), 'posts:index', 0.01)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.profiling_dir, name)))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, True)
+
+    def test_metrics_available_to_internal_ips(self):
+        """Метрики отдаются внутренним адресам в формате Prometheus"""
+        with self.settings(METRICS_DIR=self.metrics_dir):
+            self.client.get(reverse('posts:index'))
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+        for line in (
+            'yatube_request_duration_seconds_bucket{view="posts:index"',
+            'yatube_db_queries_total{view="posts:index"}',
+            'yatube_responses_total{status="200"}',
+            'yatube_cache_requests_total{result=',
+        ):
+            with self.subTest(line=line):
+                self.assertContains(response, line)
+
+    def test_metrics_hidden_from_outside(self):
+        """Снаружи эндпоинт метрик не виден"""
+        with self.settings(METRICS_DIR=self.metrics_dir):
+            response = self.client.get(
+                reverse('metrics'), REMOTE_ADDR='203.0.113.1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND.value)
+
+    def test_concurrent_flushes(self):
+        """Потоки сбрасывают метрики одновременно без ошибок"""
+        registry = Registry()
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(20):
+                    registry.flush(force=True)
+            except OSError as error:
+                errors.append(error)
+
+        with self.settings(METRICS_DIR=self.metrics_dir):
+            registry.inc('requests', {'view': 'posts:index'})
+            threads = [threading.Thread(target=flush) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            data = read_file(registry.path())
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            data['counters'], [['requests', {'view': 'posts:index'}, 1]])
+        self.assertEqual(os.listdir(self.metrics_dir), [
+            os.path.basename(registry.path())])
+
+
+class SlowQueryTests(TestCase):
+    def test_slow_queries_logged_with_plan(self):
+        """Медленные запросы попадают в лог с планом выполнения"""
+        with self.settings(SLOW_QUERY_THRESHOLD=0):
+            with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+                self.client.get(
+                    reverse('posts:post_detail', args=(404,)))
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        entry = next(
+            entry for entry in entries if 'posts_post' in entry['sql'])
+        self.assertEqual(entry['view'], 'posts:post_detail')
+        self.assertIn('?', entry['shape'])
+        self.assertTrue(entry['plan'])
+
+    def test_slow_queries_summary(self):
+        """Команда slow_queries группирует записи по форме запроса"""
+        entry = {
+            'shape_id': 'abc', 'shape': 'SELECT ? FROM posts_post',
+            'view': 'posts:index', 'plan': ['SCAN posts_post'],
+        }
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir, True)
+        path = os.path.join(log_dir, 'slow.log')
+        with open(path, 'w') as log_file:
+            for duration in (10, 30):
+                log_file.write(json.dumps(
+                    dict(entry, duration_ms=duration)) + '\n')
+        out = StringIO()
+        call_command('slow_queries', file=path, stdout=out)
+        self.assertIn('всего 40.0 мс, запросов 2', out.getvalue())
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        shutil.rmtree(settings.RATELIMIT_DIR, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, settings.RATELIMIT_DIR, True)
+
+    def test_concurrent_takes_respect_limit(self):
+        """Одновременные запросы из потоков не превышают лимит"""
+        barrier = threading.Barrier(50)
+        results = []
+
+        def take():
+            barrier.wait()
+            results.append(take_token('threads', 10, 60 * 60))
+
+        threads = [threading.Thread(target=take) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 10)
+
+    def test_bucket_refills_over_period(self):
+        """Лимит 5/h восстанавливается за час, а не за время жизни кеша"""
+        with mock.patch('core.ratelimit.time') as clock:
+            clock.time.return_value = 1000.0
+            for _ in range(5):
+                self.assertTrue(take_token('hourly', 5, 60 * 60))
+            self.assertFalse(take_token('hourly', 5, 60 * 60))
+            clock.time.return_value = 1000.0 + 5 * 60
+            self.assertFalse(take_token('hourly', 5, 60 * 60))
+            clock.time.return_value = 1000.0 + 12 * 60
+            self.assertTrue(take_token('hourly', 5, 60 * 60))
+            self.assertFalse(take_token('hourly', 5, 60 * 60))
+            clock.time.return_value = 1000.0 + 3 * 60 * 60
+            for _ in range(5):
+                self.assertTrue(take_token('hourly', 5, 60 * 60))
+            self.assertFalse(take_token('hourly', 5, 60 * 60))
+
+    def test_write_endpoint_is_limited(self):
+        """Превышение лимита на запись отдает 429"""
+        user = User.objects.create_user(username='writer')
+        self.client.force_login(user)
+        url = reverse('posts:post_create')
+        with self.settings(RATELIMITS={
+            'posts:post_create': ('2/m', ('POST',))
+        }):
+            for _ in range(2):
+                response = self.client.post(url, {'text': ''})
+                self.assertEqual(response.status_code, HTTPStatus.OK.value)
+            response = self.client.post(url, {'text': ''})
+            self.assertEqual(
+                response.status_code, HTTPStatus.TOO_MANY_REQUESTS.value)
+            self.assertIn('Retry-After', response)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK.value)
+
+
+class WarmupTests(TestCase):
+    def setUp(self):
+        warmup.ready.clear()
+        self.addCleanup(warmup.ready.clear)
+        cache.clear()
+
+    def test_ready_after_warm_up(self):
+        """/ready отвечает 503, пока процесс не прогрет"""
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.SERVICE_UNAVAILABLE.value)
+        out = StringIO()
+        call_command('warmup', stdout=out)
+        for step in ('templates', 'urls', 'registries', 'pages'):
+            with self.subTest(step=step):
+                self.assertIn(f'{step}: ', out.getvalue())
+        self.assertNotIn('ошибка', out.getvalue())
+        response = self.client.get(reverse('ready'))
+        self.assertEqual(response.status_code, HTTPStatus.OK.value)
+
+    def test_index_is_cached_by_warm_up(self):
+        """Прогрев кладет главную в кеш под ключом настоящих запросов"""
+        user = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', description='Описание', slug='warm')
+        Post.objects.create(author=user, text='Пост', group=group)
+        with self.settings(SITE_URL='http://testserver'):
+            warmup.warm_up()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост')
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('posts:index'),
+                HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Пост', gzip.decompress(response.content).decode())
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        compress = compression.compress
+
+        def counted(data, encoding):
+            self.calls += 1
+            return compress(data, encoding)
+
+        compression.compress = counted
+        self.addCleanup(setattr, compression, 'compress', compress)
+
+    def test_cached_page_is_compressed_once(self):
+        """Попадание в cache_page отдает уже сжатые байты"""
+        for _ in range(2):
+            response = self.client.get(
+                reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertIn(b'</html>', gzip.decompress(response.content))
+        self.assertEqual(self.calls, 1)
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streamed_page_is_compressed(self):
+        User.objects.create_user(username='author')
+        response = self.client.get(
+            reverse('posts:profile', args=['author']),
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn('Все посты пользователя'.encode(), content)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, True)
+        os.makedirs(os.path.join(source, 'css'))
+        self.css = b'body { color: red; }\n' * 50
+        with open(os.path.join(source, 'css', 'site.css'), 'wb') as file:
+            file.write(self.css)
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        static = self.settings(STATICFILES_DIRS=[source], STATIC_ROOT=root)
+        static.enable()
+        self.addCleanup(static.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_collected_files_are_hashed_and_precompressed(self):
+        """collectstatic пишет имя с хешем и сжатую копию рядом"""
+        name = staticfiles_storage.stored_name('css/site.css')
+        self.assertRegex(name, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(staticfiles_storage.exists(f'{name}.gz'))
+        response = self.client.get(
+            reverse('static', args=[name]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), self.css)
+        response = self.client.get(reverse('static', args=['css/site.css']))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response.get('Cache-Control', ''))
@@ -1,4 +1,19 @@
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.cache import never_cache
+from django.views.static import serve
+from core import metrics as metrics_registry
+from core.compression import accepted_encodings
+from core import warmup
+from core.profiling import list_profiles, profile_report
+from posts.storage import HashedImageStorage
 
 
 def page_not_found(request, exception):
@@ -15,3 +30,82 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    response = serve(request, path, document_root, show_indexes)
+    if HashedImageStorage.is_hashed(path):
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.IMMUTABLE_CACHE_TIME,
+            immutable=True
+        )
+    return response
+
+
+def serve_static(request, path):
+    """
+    Статика из STATIC_ROOT, когда ее не раздает веб-сервер:
+    готовая .br или .gz копия вместо сжатия на лету и год
+    кеширования для имен с хешем.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    encodings = accepted_encodings(request)
+    for extension, encoding in (('.br', 'br'), ('.gz', 'gzip')):
+        if encoding in encodings and os.path.exists(
+                os.path.join(settings.STATIC_ROOT, f'{path}{extension}')):
+            response = serve(
+                request, f'{path}{extension}', settings.STATIC_ROOT)
+            response['Content-Encoding'] = encoding
+            break
+    else:
+        response = serve(request, path, settings.STATIC_ROOT)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if staticfiles_storage.is_immutable(path):
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.IMMUTABLE_CACHE_TIME,
+            immutable=True
+        )
+    return response
+
+
+@staff_member_required
+def profiles(request):
+    context = {
+        'profiles': list_profiles(),
+        'title': 'Профили запросов',
+    }
+    return render(request, 'core/profiles.html', context)
+
+
+@staff_member_required
+def profile_detail(request, name):
+    if name not in {item['name'] for item in list_profiles()}:
+        raise Http404
+    context = {
+        'name': name,
+        'report': profile_report(name),
+        'title': f'Профиль {name}',
+    }
+    return render(request, 'core/profile_detail.html', context)
+
+
+def metrics(request):
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(
+        metrics_registry.render(metrics_registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@never_cache
+def ready(request):
+    """Проверка балансировщика: 200 только у прогретого процесса."""
+    if not warmup.ready.is_set():
+        return HttpResponse(
+            'warming up', status=503, content_type='text/plain')
+    return HttpResponse('ready', content_type='text/plain')
@@ -0,0 +1,168 @@
+import io
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.models import Count
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver, reverse
+from posts.autocomplete import indexes
+from posts.groups import registry as groups
+from posts.models import Group
+
+User = get_user_model()
+
+logger = logging.getLogger('yatube.warmup')
+
+# Выставляется, когда прогрев процесса закончен: его читает /ready
+ready = threading.Event()
+
+# cache_page хранит свою копию страницы на каждое значение
+# Accept-Encoding (Vary): прогреваются заголовки популярных браузеров
+# и запрос без сжатия
+ACCEPT_ENCODINGS = (
+    '',
+    'gzip, deflate, br, zstd',
+    'gzip, deflate, br',
+    'gzip, deflate',
+)
+
+
+def template_dirs():
+    """Каталоги шаблонов проекта, без шаблонов сторонних приложений."""
+    dirs = list(engines['django'].engine.dirs)
+    dirs += [
+        str(path) for path in get_app_template_dirs('templates')
+        if str(path).startswith(settings.BASE_DIR)
+    ]
+    return dirs
+
+
+def compile_templates():
+    """
+    Компилирует все html-шаблоны проекта. При DEBUG = False шаблоны
+    кеширует cached loader, и первый запрос их уже не разбирает.
+    """
+    engine = engines['django']
+    count = 0
+    for directory in template_dirs():
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.endswith('.html'):
+                    engine.get_template(os.path.relpath(
+                        os.path.join(root, name), directory))
+                    count += 1
+    return f'шаблонов: {count}'
+
+
+def populate_urls():
+    return f'адресов: {len(get_resolver().reverse_dict)}'
+
+
+def load_registries():
+    """Группы, индексы автодополнения и первый запрос к пользователям."""
+    groups.all()
+    for index in indexes.values():
+        index.refresh()
+    User.objects.first()
+    return f'групп: {len(groups.all())}'
+
+
+def request_page(handler, path, accept_encoding=''):
+    """Прогоняет GET path через WSGI-обработчик со всеми middleware."""
+    site = urlsplit(settings.SITE_URL)
+    default_port = 443 if site.scheme == 'https' else 80
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': site.hostname,
+        'SERVER_PORT': str(site.port or default_port),
+        'HTTP_HOST': site.netloc,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.url_scheme': site.scheme,
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+    }
+    if accept_encoding:
+        environ['HTTP_ACCEPT_ENCODING'] = accept_encoding
+    statuses = []
+    body = handler(
+        environ,
+        lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return statuses[0]
+
+
+def render_pages():
+    """
+    Главная и самые большие группы: главная во всех вариантах сжатия
+    попадает в кеш cache_page, страницы групп прогревают запросы
+    и шаблоны. Адреса строятся от SITE_URL, чтобы ключи кеша совпали
+    с ключами настоящих запросов.
+    """
+    pages = [
+        (reverse('posts:index'), encoding) for encoding in ACCEPT_ENCODINGS
+    ]
+    top_groups = Group.objects.annotate(
+        posts_count=Count('posts')
+    ).order_by('-posts_count').values_list('slug', flat=True)
+    pages += [
+        (reverse('posts:group_list', args=[slug]), '')
+        for slug in top_groups[:settings.WARMUP_GROUPS]
+    ]
+    handler = WSGIHandler()
+    for path, encoding in pages:
+        status = request_page(handler, path, encoding)
+        if not status.startswith('200'):
+            logger.warning('Прогрев %s: ответ %s', path, status)
+    return f'страниц: {len(pages)}'
+
+
+STEPS = (
+    ('templates', compile_templates),
+    ('urls', populate_urls),
+    ('registries', load_registries),
+    ('pages', render_pages),
+)
+
+
+def warm_up():
+    """
+    Прогревает процесс и отмечает его готовым. Ошибка шага
+    пишется в лог и не мешает остальным: недогретый процесс
+    лучше, чем процесс, который никогда не станет готовым.
+    Возвращает список (шаг, итог, секунды).
+    """
+    results = []
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            summary = step()
+        except Exception:
+            logger.exception('Шаг прогрева %s не выполнен', name)
+            summary = 'ошибка'
+        results.append((name, summary, time.perf_counter() - started))
+    ready.set()
+    return results
+
+
+def start():
+    """
+    Запускает прогрев в фоне при старте WSGI-процесса: сервер уже
+    принимает запросы, но /ready отвечает 503, пока прогрев не закончен.
+    """
+    thread = threading.Thread(target=warm_up, name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -1,8 +1,35 @@
 from django.contrib import admin
-from posts.models import Post, Group, Comment, Follow
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.urls import reverse
+from posts.autocomplete import groups_index, users
+from posts.models import Post, Group, Comment, Follow, Like, User
 
+AUTOCOMPLETE_INDEXES = {User: users, Group: groups_index}
 
-class PostAdmin(admin.ModelAdmin):
+
+class PrefixAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение админки по префиксному индексу сайта."""
+    def __init__(self, index, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index = index
+
+    def get_url(self):
+        return reverse('posts:autocomplete', args=[self.index.name])
+
+
+class PrefixAutocompleteMixin:
+    """Внешние ключи на пользователей и группы выбираются поиском."""
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        index = AUTOCOMPLETE_INDEXES.get(db_field.related_model)
+        if index is not None:
+            kwargs['widget'] = PrefixAutocompleteSelect(
+                index, db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class PostAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
@@ -18,7 +45,7 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'post', 'author', 'pub_date')
     search_fields = ('text',)
     list_filter = ('pub_date',)
@@ -26,14 +53,21 @@ class CommentAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = ('pk', 'author', 'user')
-    search_fields = ('user',)
+    search_fields = ('^user__username', '^author__username')
     list_filter = ('author',)
     empty_value_display = '-пусто-'
 
 
+class LikeAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
+    list_display = ('pk', 'post', 'user')
+    list_filter = ('post',)
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Like, LikeAdmin)
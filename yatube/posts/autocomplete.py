@@ -0,0 +1,90 @@
+import threading
+from bisect import bisect_left
+
+from django.contrib.auth import get_user_model
+from core import invalidation
+from posts.groups import registry as groups
+
+User = get_user_model()
+
+
+def normalize(text):
+    return text.strip().casefold()
+
+
+class PrefixIndex:
+    """
+    Отсортированный массив нормализованных ключей процесса.
+    Поиск по префиксу - bisect и проход по соседним ключам,
+    массив перечитывается, когда любой процесс сменил метку stamp.
+    """
+    def __init__(self, name, stamp, loader):
+        self.name = name
+        self.stamp = stamp
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.version = False
+        # Ключи, записи и подписи меняются одним присваиванием
+        self.data = ([], [], {})
+
+    def refresh(self):
+        current = invalidation.version(self.stamp)
+        if current == self.version:
+            return
+        with self.lock:
+            rows = sorted(
+                (normalize(key), value, label)
+                for key, value, label in self.loader()
+            )
+            entries = [(value, label) for _, value, label in rows]
+            self.data = (
+                [key for key, _, _ in rows], entries, dict(entries))
+            self.version = current
+
+    def search(self, prefix, limit):
+        self.refresh()
+        prefix = normalize(prefix)
+        keys, entries, _ = self.data
+        results = []
+        seen = set()
+        position = bisect_left(keys, prefix)
+        while (position < len(keys) and len(results) < limit
+               and keys[position].startswith(prefix)):
+            value, label = entries[position]
+            if value not in seen:
+                seen.add(value)
+                results.append((value, label))
+            position += 1
+        return results
+
+    def label(self, value):
+        self.refresh()
+        try:
+            return self.data[2].get(int(value), '')
+        except (TypeError, ValueError):
+            return ''
+
+    def forget(self):
+        """Перечитать при следующем обращении только в этом процессе."""
+        self.version = False
+
+    def invalidate(self):
+        invalidation.bump(self.stamp)
+
+
+def load_users():
+    for pk, username in User.objects.values_list('pk', 'username'):
+        yield username, pk, username
+
+
+def load_groups():
+    for group in groups.all():
+        yield group.slug, group.pk, group.title
+        yield group.title, group.pk, group.title
+
+
+users = PrefixIndex('users', 'usernames', load_users)
+# Метка общая с реестром групп: меняется при любом изменении группы
+groups_index = PrefixIndex('groups', groups.name, load_groups)
+
+indexes = {index.name: index for index in (users, groups_index)}
@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from posts.groups import registry as groups
+from posts.models import Post
+
+User = get_user_model()
+
+SHARD = re.compile(r'sitemap-(\d+)')
+
+
+def absolute(path):
+    return f'{settings.SITE_URL}{path}'
+
+
+def file_path(name):
+    return os.path.join(settings.PUBLISH_DIR, f'{name}.xml')
+
+
+def marker_path(name):
+    return os.path.join(settings.PUBLISH_DIR, 'dirty', name)
+
+
+def mark_dirty(*names):
+    """Помечает файлы устаревшими: их пересоберут при следующем запросе."""
+    os.makedirs(os.path.dirname(marker_path('')), exist_ok=True)
+    for name in names:
+        open(marker_path(name), 'w').close()
+
+
+def dirty_names():
+    try:
+        return sorted(os.listdir(os.path.dirname(marker_path(''))))
+    except FileNotFoundError:
+        return []
+
+
+def shard_name(post_id):
+    return f'sitemap-{(post_id - 1) // settings.SITEMAP_SHARD_SIZE}'
+
+
+def last_shard():
+    max_pk = Post.objects.aggregate(Max('pk'))['pk__max']
+    if max_pk is None:
+        return -1
+    return (max_pk - 1) // settings.SITEMAP_SHARD_SIZE
+
+
+def build_sitemap_index():
+    locations = [absolute(reverse('posts:sitemap_pages'))]
+    locations += [
+        absolute(reverse('posts:sitemap_shard', args=[shard]))
+        for shard in range(last_shard() + 1)
+    ]
+    return render_to_string(
+        'posts/published/sitemap_index.xml', {'locations': locations})
+
+
+def build_sitemap(locations):
+    return render_to_string(
+        'posts/published/sitemap.xml', {'locations': locations})
+
+
+def build_pages_shard():
+    locations = [absolute(reverse('posts:index'))]
+    locations += [
+        absolute(reverse('posts:group_list', args=[group.slug]))
+        for group in groups.all()
+    ]
+    authors = (
+        User.objects.filter(posts__isnull=False).distinct()
+        .order_by('username').values_list('username', flat=True)
+    )
+    locations += [
+        absolute(reverse('posts:profile', args=[username]))
+        for username in authors
+    ]
+    return build_sitemap(locations)
+
+
+def build_posts_shard(shard):
+    """Шард постов - диапазон pk, без OFFSET по всей таблице."""
+    if shard > last_shard():
+        return None
+    size = settings.SITEMAP_SHARD_SIZE
+    ids = Post.objects.filter(
+        pk__gt=shard * size, pk__lte=(shard + 1) * size
+    ).order_by('pk').values_list('pk', flat=True)
+    return build_sitemap([
+        absolute(reverse('posts:post_detail', args=[pk])) for pk in ids])
+
+
+def build_feed(title, link, feed_link, posts):
+    feed = Atom1Feed(
+        title=title,
+        link=absolute(link),
+        description=title,
+        feed_url=absolute(feed_link),
+        language='ru'
+    )
+    posts = posts.select_related('author').defer('text')
+    for post in posts[:settings.FEED_SIZE]:
+        post_link = absolute(
+            reverse('posts:post_detail', args=[post.pk]))
+        feed.add_item(
+            title=Truncator(post.excerpt).chars(60),
+            link=post_link,
+            unique_id=post_link,
+            description=post.text_html,
+            author_name=post.author.username,
+            pubdate=post.pub_date
+        )
+    return feed.writeString('utf-8')
+
+
+def build_group_feed(slug):
+    group = groups.get_by_slug(slug)
+    if group is None:
+        return None
+    return build_feed(
+        f'Yatube: {group.title}',
+        reverse('posts:group_list', args=[slug]),
+        reverse('posts:group_feed', args=[slug]),
+        Post.objects.filter(group_id=group.pk)
+    )
+
+
+def build_author_feed(username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return None
+    return build_feed(
+        f'Yatube: {username}',
+        reverse('posts:profile', args=[username]),
+        reverse('posts:author_feed', args=[username]),
+        Post.objects.filter(author=author)
+    )
+
+
+def build(name):
+    """Содержимое файла name или None, если такого файла быть не может."""
+    if name == 'sitemap':
+        return build_sitemap_index()
+    if name == 'sitemap-pages':
+        return build_pages_shard()
+    match = SHARD.fullmatch(name)
+    if match:
+        return build_posts_shard(int(match[1]))
+    if name == 'feed':
+        return build_feed(
+            'Yatube',
+            reverse('posts:index'),
+            reverse('posts:feed'),
+            Post.objects.all()
+        )
+    if name.startswith('feed-group-'):
+        return build_group_feed(name[len('feed-group-'):])
+    if name.startswith('feed-author-'):
+        return build_author_feed(name[len('feed-author-'):])
+    return None
+
+
+def refresh(name):
+    """
+    Путь к актуальному файлу name. Пересобирает файл, только если
+    он помечен устаревшим или еще не собран; иначе БД не трогается.
+    """
+    target = file_path(name)
+    try:
+        os.unlink(marker_path(name))
+    except FileNotFoundError:
+        if os.path.exists(target):
+            return target
+    # Метка снята до сборки: изменения во время сборки пометят файл снова
+    try:
+        content = build(name)
+    except Exception:
+        mark_dirty(name)
+        raise
+    if content is None:
+        try:
+            os.unlink(target)
+        except FileNotFoundError:
+            pass
+        return None
+    os.makedirs(settings.PUBLISH_DIR, exist_ok=True)
+    temp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(temp, target)
+    return target
+
+
+def all_names():
+    names = ['sitemap', 'sitemap-pages', 'feed']
+    names += [f'sitemap-{shard}' for shard in range(last_shard() + 1)]
+    names += [f'feed-group-{group.slug}' for group in groups.all()]
+    names += [
+        f'feed-author-{username}'
+        for username in User.objects.filter(posts__isnull=False)
+        .distinct().values_list('username', flat=True)
+    ]
+    return names
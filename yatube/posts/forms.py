@@ -1,14 +1,103 @@
 from django import forms
-from posts.models import Post, Comment
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+from posts.autocomplete import groups_index
+from posts.groups import registry as groups
+from posts.models import Post, Comment, Upload
+from posts.uploads import (UploadError, assembled_file, discard_upload,
+                           image_name)
+
+
+class AutocompleteInput(forms.Widget):
+    """
+    Скрытое поле со значением и строка поиска с подсказками
+    из префиксного индекса вместо <select> со всеми вариантами.
+    """
+    template_name = 'posts/widgets/autocomplete.html'
+
+    def __init__(self, index, attrs=None):
+        super().__init__(attrs)
+        self.index = index
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = reverse(
+            'posts:autocomplete', args=[self.index.name])
+        context['widget']['label'] = (
+            self.index.label(value) if value else '')
+        return context
+
+
+class GroupChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for group in groups.all():
+            yield self.choice(group)
+
+    def __len__(self):
+        return len(groups.all()) + (self.field.empty_label is not None)
+
+
+class GroupChoiceField(forms.ModelChoiceField):
+    """Выбор группы по реестру групп, без запросов к базе."""
+    iterator = GroupChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            group = groups.get(int(value))
+        except (TypeError, ValueError):
+            group = None
+        if group is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice')
+        return group
 
 
 class PostForm(forms.ModelForm):
+    upload_token = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'group': GroupChoiceField}
+        widgets = {'group': AutocompleteInput(groups_index)}
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.upload = None
+        self.image_name = None
+
+    def clean_upload_token(self):
+        token = self.cleaned_data['upload_token']
+        if token is None:
+            return token
+        self.upload = Upload.objects.filter(
+            token=token, user=self.user, completed=True).first()
+        if self.upload is None:
+            raise forms.ValidationError('Загрузка не найдена')
+        try:
+            self.image_name = image_name(self.upload)
+        except UploadError as error:
+            self.upload = None
+            raise forms.ValidationError(str(error))
+        return token
+
+    def save(self, commit=True):
+        if self.upload is None:
+            return super().save(commit)
+        self.instance.image = assembled_file(self.upload, self.image_name)
+        post = super().save(commit)
+        if commit:
+            discard_upload(self.upload)
+        return post
 
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
-        fields = ('text', )
+        fields = ('text', 'parent')
+        widgets = {'parent': forms.HiddenInput}
@@ -0,0 +1,68 @@
+import threading
+
+from django.http import Http404
+from core import invalidation
+from posts.models import Group
+
+
+class GroupRegistry:
+    """
+    Группы процесса в памяти по slug и id.
+    Загружаются при первом обращении и перечитываются,
+    когда любой процесс сохранил или удалил группу.
+    """
+    name = 'groups'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = False
+        self.by_slug = {}
+        self.by_id = {}
+
+    def refresh(self):
+        current = invalidation.version(self.name)
+        if current == self.version:
+            return
+        with self.lock:
+            groups = list(Group.objects.order_by('title'))
+            self.by_slug = {group.slug: group for group in groups}
+            self.by_id = {group.pk: group for group in groups}
+            self.version = current
+
+    def all(self):
+        self.refresh()
+        return list(self.by_slug.values())
+
+    def get(self, pk):
+        self.refresh()
+        return self.by_id.get(pk)
+
+    def get_by_slug(self, slug):
+        self.refresh()
+        return self.by_slug.get(slug)
+
+    def forget(self):
+        """Перечитать при следующем обращении только в этом процессе."""
+        self.version = False
+
+    def invalidate(self):
+        invalidation.bump(self.name)
+
+
+registry = GroupRegistry()
+
+
+def get_group_or_404(slug):
+    group = registry.get_by_slug(slug)
+    if group is None:
+        raise Http404('Группа не найдена')
+    return group
+
+
+def attach_groups(page_obj):
+    """Подставляет группы постов страницы из реестра вместо JOIN."""
+    page_obj.object_list = list(page_obj.object_list)
+    for post in page_obj.object_list:
+        if post.group_id is not None:
+            post.group = registry.get(post.group_id)
+    return page_obj
@@ -0,0 +1,97 @@
+import base64
+import io
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import features, Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+PLACEHOLDER_WIDTH = 24
+
+
+def variant_formats():
+    if features.check('webp'):
+        return ('WEBP', 'JPEG')
+    return ('JPEG',)
+
+
+def variant_geometry(width):
+    full_width, full_height = settings.POST_IMAGE_SIZE
+    return f'{width}x{round(width * full_height / full_width)}'
+
+
+def build_variants(image):
+    """
+    Нарезает картинку на ширины из POST_IMAGE_WIDTHS
+    во всех поддерживаемых форматах.
+    """
+    variants = {}
+    for image_format in variant_formats():
+        variants[image_format.lower()] = [
+            (get_thumbnail(
+                image,
+                variant_geometry(width),
+                crop='center',
+                upscale=True,
+                format=image_format
+            ).url, width)
+            for width in settings.POST_IMAGE_WIDTHS
+        ]
+    return variants
+
+
+def image_variants(image):
+    # Имя картинки - хэш содержимого, поэтому варианты можно кэшировать
+    # без инвалидации
+    key = f'posts:variants:{image.name}'
+    variants = cache.get(key)
+    if variants is None:
+        variants = build_variants(image)
+        cache.set(key, variants, settings.IMMUTABLE_CACHE_TIME)
+    return variants
+
+
+def placeholder(source):
+    full_width, full_height = settings.POST_IMAGE_SIZE
+    size = (
+        PLACEHOLDER_WIDTH,
+        max(1, round(PLACEHOLDER_WIDTH * full_height / full_width))
+    )
+    preview = ImageOps.fit(source.convert('RGB'), size)
+    buffer = io.BytesIO()
+    preview.save(buffer, format='JPEG', quality=50)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def image_metadata(image):
+    """
+    Размеры, формат, вес, превью и варианты картинки,
+    чтобы шаблонам не приходилось читать файл.
+    """
+    image.open('rb')
+    image.seek(0)
+    with Image.open(image) as source:
+        source.load()
+        metadata = {
+            'image_width': source.width,
+            'image_height': source.height,
+            'image_format': source.format or '',
+            'image_size': image.size,
+            'image_placeholder': placeholder(source),
+        }
+    image.seek(0)
+    metadata['image_variants'] = json.dumps(build_variants(image))
+    return metadata
+
+
+def empty_metadata():
+    return {
+        'image_width': None,
+        'image_height': None,
+        'image_format': '',
+        'image_size': None,
+        'image_placeholder': '',
+        'image_variants': '',
+    }
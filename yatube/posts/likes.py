@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from posts.models import Like, LikeDelta, Post
+
+
+def like(user, post):
+    with transaction.atomic():
+        _, created = Like.objects.get_or_create(user=user, post=post)
+        if created:
+            LikeDelta.objects.create(post=post, delta=1)
+
+
+def unlike(user, post):
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            LikeDelta.objects.create(post=post, delta=-1)
+
+
+def flush_like_counters():
+    """Переносит накопленные изменения в Post.likes_count."""
+    with transaction.atomic():
+        last = LikeDelta.objects.aggregate(Max('pk'))['pk__max']
+        if last is None:
+            return 0
+        pending = LikeDelta.objects.filter(pk__lte=last)
+        totals = pending.values('post').annotate(total=Sum('delta'))
+        for row in totals:
+            if row['total']:
+                Post.objects.filter(pk=row['post']).update(
+                    likes_count=F('likes_count') + row['total'])
+        pending.delete()
+    return len(totals)
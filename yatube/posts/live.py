@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import socket
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from posts.groups import registry as groups
+from posts.models import Follow, Post
+from posts.streaming import page_ids
+
+
+def publish(post):
+    """
+    Отправляет новый пост live-процессу датаграммой в LIVE_SOCKET.
+    Если процесс не запущен или не успевает читать, событие теряется:
+    сохранение поста от этого не зависит.
+    """
+    message = json.dumps({
+        'id': post.pk,
+        'author': post.author_id,
+        'group': post.group_id,
+    }).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        try:
+            sock.sendto(message, settings.LIVE_SOCKET)
+        except OSError:
+            pass
+
+
+def live_url(page_obj, **params):
+    """Адрес потока новых постов для первой страницы ленты."""
+    if page_obj.number != 1:
+        return None
+    since = max(page_ids(page_obj), default=0)
+    return f'{settings.LIVE_URL}?{urlencode(dict(params, since=since))}'
+
+
+class Feed:
+    """Лента, на которую подписан читатель: все посты, группа или авторы."""
+    def __init__(self, group_id=None, authors=None):
+        self.group_id = group_id
+        self.authors = authors
+
+    def matches(self, message):
+        if self.group_id is not None:
+            return message['group'] == self.group_id
+        if self.authors is not None:
+            return message['author'] in self.authors
+        return True
+
+    def count_since(self, since):
+        posts = Post.objects.filter(pk__gt=since)
+        if self.group_id is not None:
+            posts = posts.filter(group_id=self.group_id)
+        if self.authors is not None:
+            posts = posts.filter(author_id__in=self.authors)
+        return posts.count()
+
+
+def session_user(cookie_header):
+    cookies = SimpleCookie(cookie_header)
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    store = import_module(settings.SESSION_ENGINE).SessionStore(
+        morsel.value if morsel else None)
+    return get_user(SimpleNamespace(session=store))
+
+
+def connect(params, cookie_header):
+    """
+    Синхронная часть подключения: лента по параметрам запроса
+    и число ее постов новее since. Выполняется в пуле потоков.
+    """
+    try:
+        name = params.get('feed', 'index')
+        if name == 'index':
+            feed = Feed()
+        elif name == 'group':
+            group = groups.get_by_slug(params.get('group', ''))
+            if group is None:
+                return None, 0
+            feed = Feed(group_id=group.pk)
+        elif name == 'follow':
+            user = session_user(cookie_header)
+            if not user.is_authenticated:
+                return None, 0
+            feed = Feed(authors=set(
+                Follow.objects.filter(user=user)
+                .values_list('author_id', flat=True)
+            ))
+        else:
+            return None, 0
+        since = params.get('since', '')
+        return feed, feed.count_since(int(since)) if since.isdigit() else 0
+    finally:
+        close_old_connections()
+
+
+class Subscriber:
+    """Счетчик новых постов одного соединения, без очереди сообщений."""
+    def __init__(self, feed, count):
+        self.feed = feed
+        self.count = count
+        self.changed = asyncio.Event()
+
+    def notify(self, message):
+        if self.feed.matches(message):
+            self.count += 1
+            self.changed.set()
+
+
+class Hub(asyncio.DatagramProtocol):
+    """Принимает датаграммы publish() и раздает их подписчикам процесса."""
+    def __init__(self):
+        self.subscribers = set()
+        self.transport = None
+
+    async def start(self):
+        if self.transport is not None:
+            return
+        try:
+            os.unlink(settings.LIVE_SOCKET)
+        except FileNotFoundError:
+            pass
+        self.transport, _ = (
+            await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: self,
+                local_addr=settings.LIVE_SOCKET,
+                family=socket.AF_UNIX
+            ))
+
+    def stop(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def datagram_received(self, data, addr):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        for subscriber in list(self.subscribers):
+            subscriber.notify(message)
+
+    def subscribe(self, feed, count=0):
+        subscriber = Subscriber(feed, count)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+
+hub = Hub()
+
+
+async def respond(send, status, body=b'', content_type=b'text/plain'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'cache-control', b'no-store'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def subscribe(scope):
+    await hub.start()
+    params = {
+        key: values[-1]
+        for key, values in parse_qs(scope['query_string'].decode()).items()
+    }
+    cookie_header = b'; '.join(
+        value for name, value in scope['headers'] if name == b'cookie'
+    ).decode('latin-1')
+    feed, count = await asyncio.get_running_loop().run_in_executor(
+        None, connect, params, cookie_header)
+    if feed is None:
+        return None
+    return hub.subscribe(feed, count)
+
+
+async def stream(scope, receive, send):
+    """Server-Sent Events: событие posts при каждом новом посте ленты."""
+    subscriber = await subscribe(scope)
+    if subscriber is None:
+        return await respond(send, 404)
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-store'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        sent = None
+        while not disconnected.done():
+            subscriber.changed.clear()
+            if subscriber.count != sent:
+                sent = subscriber.count
+                data = json.dumps({'count': sent})
+                chunk = f'event: posts\ndata: {data}\n\n'.encode()
+            else:
+                chunk = b': keepalive\n\n'
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': True,
+            })
+            changed = asyncio.ensure_future(subscriber.changed.wait())
+            await asyncio.wait(
+                {changed, disconnected},
+                timeout=settings.LIVE_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            changed.cancel()
+    finally:
+        hub.unsubscribe(subscriber)
+        disconnected.cancel()
+
+
+async def poll(scope, receive, send):
+    """
+    Long-poll для клиентов без EventSource: ждет, пока новых постов
+    станет больше known, но не дольше LIVE_POLL_TIMEOUT.
+    """
+    subscriber = await subscribe(scope)
+    if subscriber is None:
+        return await respond(send, 404)
+    known = parse_qs(scope['query_string'].decode()).get('known', ['0'])[-1]
+    known = int(known) if known.isdigit() else 0
+    try:
+        while subscriber.count <= known:
+            subscriber.changed.clear()
+            await asyncio.wait_for(
+                subscriber.changed.wait(), settings.LIVE_POLL_TIMEOUT)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        hub.unsubscribe(subscriber)
+    await respond(
+        send, 200,
+        json.dumps({'count': subscriber.count}).encode(),
+        b'application/json'
+    )
+
+
+async def application(scope, receive, send):
+    """
+    ASGI-приложение live-уведомлений. Остальной сайт обслуживает WSGI,
+    сюда проксируются только адреса под LIVE_URL. Работает в одном
+    процессе: он слушает LIVE_SOCKET и держит все соединения.
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await hub.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                hub.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+    if scope['path'] == settings.LIVE_URL:
+        await stream(scope, receive, send)
+    elif scope['path'] == f'{settings.LIVE_URL}poll/':
+        await poll(scope, receive, send)
+    else:
+        await respond(send, 404)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from posts.images import image_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет метаданные картинок у существующих постов'
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.exclude(image='')
+            .filter(image_format='')
+            .only('pk', 'image')
+        )
+        count = 0
+        for post in posts.iterator():
+            try:
+                metadata = image_metadata(post.image)
+            except OSError as error:
+                self.stderr.write(f'Пост {post.pk}: {error}')
+                continue
+            # update() не трогает сигналы и остальные поля поста
+            Post.objects.filter(pk=post.pk).update(**metadata)
+            count += 1
+        self.stdout.write(f'Обновлено постов: {count}')
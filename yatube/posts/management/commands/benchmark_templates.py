@@ -0,0 +1,71 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.template import engines
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from posts.groups import attach_groups
+from posts.models import Group, Post
+from yatube.settings import POSTS_IN_PAGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость рендера страниц лент на Django-шаблонах '
+        'и Jinja2 на постах из базы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Рендеров каждой страницы каждым движком')
+
+    def page(self, posts):
+        paginator = Paginator(
+            posts.select_related('author').defer('text'), POSTS_IN_PAGE)
+        return attach_groups(paginator.get_page(1))
+
+    def pages(self):
+        """Страницы с уже загруженными постами: в замер не входит БД."""
+        yield reverse('posts:index'), 'posts/index.html', {
+            'page_obj': self.page(Post.objects.all()),
+        }
+        group = Group.objects.annotate(
+            posts_count=Count('posts')).order_by('-posts_count').first()
+        if group is not None:
+            yield (
+                reverse('posts:group_list', args=[group.slug]),
+                'posts/group_list.html',
+                {'group': group, 'page_obj': self.page(group.posts.all())}
+            )
+
+    def handle(self, *args, **options):
+        available = [engine.name for engine in engines.all()]
+        repeat = options['repeat']
+        for path, template_name, context in self.pages():
+            request = RequestFactory().get(path)
+            request.user = AnonymousUser()
+            request.resolver_match = resolve(path)
+            timings = {}
+            for name in ('django', 'jinja2'):
+                if name not in available:
+                    self.stdout.write(f'{name}: движок не настроен')
+                    continue
+                template = engines[name].get_template(template_name)
+                template.render(dict(context), request)
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    template.render(dict(context), request)
+                timings[name] = (time.perf_counter() - started) / repeat
+                self.stdout.write(
+                    f'{name} {template_name}: '
+                    f'{1 / timings[name]:.0f} рендеров/с, '
+                    f'{timings[name] * 1000:.2f} мс'
+                )
+            if len(timings) == 2:
+                self.stdout.write(
+                    f'  Jinja2 быстрее в '
+                    f'{timings["django"] / timings["jinja2"]:.1f} раза')
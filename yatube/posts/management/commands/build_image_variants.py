@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from posts.images import build_variants
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает адаптивные варианты картинок существующих постов'
+
+    def handle(self, *args, **options):
+        images = (
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True).distinct()
+        )
+        count = 0
+        for name in images.iterator():
+            build_variants(Post(image=name).image)
+            count += 1
+        self.stdout.write(f'Обработано картинок: {count}')
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts.models import Suggestion
+from posts.suggestions import FollowGraph, suggest_all
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации авторов по графу подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=settings.SUGGESTIONS_COUNT,
+            help='Рекомендаций на пользователя')
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Считать в нескольких процессах')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        graph = FollowGraph.load(options['batch_size'])
+        self.stdout.write(
+            f'Пользователей: {len(graph.nodes)}, '
+            f'подписок: {len(graph.targets)}')
+        # Считаем до транзакции: на SQLite она держит блокировку записи,
+        # и лайки, посты и входы ждали бы весь расчет
+        suggestions = [
+            Suggestion(
+                user_id=user_id, author_id=author_id, rank=rank, score=score)
+            for rows in suggest_all(
+                graph, options['count'], options['processes'],
+                options['chunk_size'])
+            for user_id, author_id, rank, score in rows
+        ]
+        # Таблица подменяется целиком в одной короткой транзакции
+        with transaction.atomic():
+            Suggestion.objects.all().delete()
+            Suggestion.objects.bulk_create(
+                suggestions, batch_size=options['batch_size'])
+        self.stdout.write(f'Рекомендаций: {len(suggestions)}')
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from posts.models import Upload
+from posts.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = 'Удаляет незавершенные и брошенные загрузки по частям'
+
+    def handle(self, *args, **options):
+        expired = Upload.objects.filter(
+            created__lt=timezone.now() - timedelta(
+                seconds=settings.UPLOAD_EXPIRE_TIME))
+        count = 0
+        for upload in expired.iterator():
+            discard_upload(upload)
+            count += 1
+        self.stdout.write(f'Удалено загрузок: {count}')
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from posts.likes import flush_like_counters
+
+
+class Command(BaseCommand):
+    help = 'Сворачивает буфер лайков в счетчики постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять раз в столько секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            posts = flush_like_counters()
+            self.stdout.write(f'Обновлено постов: {posts}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from posts import feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает помеченные файлы sitemap и Atom-лент'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать все файлы, например после seed')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            feeds.mark_dirty(*feeds.all_names())
+        count = 0
+        for name in feeds.dirty_names():
+            if feeds.refresh(name) is not None:
+                count += 1
+        self.stdout.write(f'Собрано файлов: {count}')
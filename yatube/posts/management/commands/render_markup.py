@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from posts.markup import MARKUP_VERSION
+from posts.models import Post
+
+FIELDS = ('text_html', 'excerpt_html', 'markup_version')
+
+
+class Command(BaseCommand):
+    help = 'Перерисовывает HTML постов, собранный старой версией разметки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перерисовать все посты, а не только устаревшие')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only('pk', 'text', 'excerpt').order_by('pk')
+        if not options['all']:
+            posts = posts.exclude(markup_version=MARKUP_VERSION)
+        count = 0
+        last = 0
+        # Пачками по pk: курсор не держится открытым во время записи
+        while True:
+            batch = list(posts.filter(pk__gt=last)[:options['batch_size']])
+            if not batch:
+                break
+            for post in batch:
+                post.render_markup()
+            # bulk_update не вызывает save() и не трогает остальные поля
+            Post.objects.bulk_update(batch, FIELDS)
+            count += len(batch)
+            last = batch[-1].pk
+        self.stdout.write(f'Перерисовано постов: {count}')
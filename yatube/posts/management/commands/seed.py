@@ -0,0 +1,289 @@
+import io
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from faker import Faker
+from PIL import Image
+from posts import autocomplete, feeds
+from posts.groups import registry as groups_registry
+from posts.images import image_metadata
+from posts.markup import MARKUP_VERSION, render
+from posts.models import (PATH_SEGMENT, Comment, Follow, Group, Post, User,
+                          make_excerpt)
+
+START_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+SENTENCES_POOL = 2000
+NAMES_POOL = 500
+IMAGES_POOL = 20
+
+
+class Inserter:
+    """
+    Пишет строки через executemany в обход ORM.
+    Поля модели, которых нет в fields, получают значения по умолчанию.
+    """
+    def __init__(self, model, fields):
+        opts = model._meta
+        extra = [
+            field for field in opts.concrete_fields
+            if field.name not in fields and not field.primary_key
+        ]
+        columns = (
+            [opts.get_field(name).column for name in fields]
+            + [field.column for field in extra]
+        )
+        self.defaults = tuple(
+            field.get_db_prep_save(field.get_default(), connection)
+            for field in extra
+        )
+        quote = connection.ops.quote_name
+        self.model = model
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(opts.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns))
+        )
+
+    def insert(self, rows, batch_size):
+        """Возвращает диапазон id вставленных строк."""
+        old_max = self.model.objects.aggregate(Max('pk'))['pk__max'] or 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            while True:
+                batch = [
+                    row + self.defaults
+                    for row in itertools.islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                cursor.executemany(self.sql, batch)
+        # Вставка идет одним потоком, поэтому новые id идут подряд
+        inserted = self.model.objects.filter(pk__gt=old_max).aggregate(
+            Min('pk'), Max('pk'))
+        if inserted['pk__min'] is None:
+            return range(0)
+        return range(inserted['pk__min'], inserted['pk__max'] + 1)
+
+
+class Command(BaseCommand):
+    help = 'Наполняет базу синтетическими данными для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows-per-user', type=float, default=10,
+            help='Среднее число подписок пользователя')
+        parser.add_argument(
+            '--popularity', type=float, default=1.2,
+            help='Показатель степенного закона популярности авторов')
+        parser.add_argument(
+            '--images', type=float, default=0,
+            help='Доля постов с картинкой, от 0 до 1')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        self.sentences = [fake.sentence() for _ in range(SENTENCES_POOL)]
+        self.first_names = [fake.first_name() for _ in range(NAMES_POOL)]
+        self.last_names = [fake.last_name() for _ in range(NAMES_POOL)]
+        self.words = [fake.word() for _ in range(NAMES_POOL)]
+        self.batch_size = options['batch_size']
+        self.prefix = f'seed{options["seed"]}'
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        users = self.seed_users(options['users'])
+        groups = self.seed_groups(options['groups'])
+        posts = self.seed_posts(
+            options['posts'], users, groups, options['images'])
+        self.seed_comments(options['comments'], users, posts)
+        self.seed_follows(
+            users, options['follows_per_user'],
+            options['popularity'])
+        self.notify_processes(posts)
+
+    def notify_processes(self, posts):
+        """
+        Строки вставлены в обход ORM, сигналы post_save не сработали:
+        метки групп и имен и устаревшие файлы лент помечаются вручную.
+        """
+        groups_registry.invalidate()
+        autocomplete.users.invalidate()
+        names = {'feed', 'sitemap', 'sitemap-pages'}
+        names.update(feeds.shard_name(pk) for pk in posts)
+        feeds.mark_dirty(*names)
+
+    def report(self, model, ids):
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {len(ids)}')
+
+    def text(self, low, high):
+        return ' '.join(
+            self.rng.choice(self.sentences)
+            for _ in range(self.rng.randint(low, high))
+        )
+
+    def date(self, offset):
+        return connection.ops.adapt_datetimefield_value(
+            START_DATE + timedelta(seconds=offset))
+
+    def seed_users(self, count):
+        # Соль из seed: иначе одинаковый seed давал бы разные хеши
+        password = make_password(self.prefix, salt=self.prefix)
+        rows = (
+            (
+                f'{self.prefix}_{number}',
+                self.rng.choice(self.first_names),
+                self.rng.choice(self.last_names),
+                f'{self.prefix}_{number}@example.com',
+                password,
+                self.date(number),
+            )
+            for number in range(count)
+        )
+        ids = Inserter(User, (
+            'username', 'first_name', 'last_name', 'email',
+            'password', 'date_joined'
+        )).insert(rows, self.batch_size)
+        self.report(User, ids)
+        return ids
+
+    def seed_groups(self, count):
+        rows = (
+            (
+                ' '.join(self.rng.sample(self.words, 2)).capitalize(),
+                self.text(1, 3),
+                f'{self.prefix}-{number}',
+            )
+            for number in range(count)
+        )
+        ids = Inserter(Group, ('title', 'description', 'slug')).insert(
+            rows, self.batch_size)
+        self.report(Group, ids)
+        return ids
+
+    def image_pool(self):
+        pool = []
+        for number in range(IMAGES_POOL):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (960, 339), color).save(buffer, format='JPEG')
+            image = Post(image=ContentFile(
+                buffer.getvalue(), name=f'{self.prefix}-{number}.jpg')).image
+            image.save(image.name, image.file, save=False)
+            metadata = image_metadata(image)
+            pool.append((image.name,) + tuple(metadata.values()))
+        return pool
+
+    def seed_posts(self, count, users, groups, images_share):
+        fields = (
+            'text', 'excerpt', 'text_length', 'text_html', 'excerpt_html',
+            'markup_version', 'author', 'group', 'pub_date')
+        pool = []
+        if images_share:
+            pool = self.image_pool()
+            fields += ('image', 'image_width', 'image_height',
+                       'image_format', 'image_size', 'image_placeholder',
+                       'image_variants')
+        step = max(1, 365 * 24 * 3600 // max(count, 1))
+
+        def rows():
+            offset = 0
+            for _ in range(count):
+                offset += self.rng.randint(1, 2 * step)
+                text = self.text(1, 8)
+                excerpt = make_excerpt(text)
+                # В сгенерированном тексте нет упоминаний, БД не нужна
+                row = (
+                    text,
+                    excerpt,
+                    len(text),
+                    render(text, users=()),
+                    render(excerpt, users=()),
+                    MARKUP_VERSION,
+                    self.rng.choice(users),
+                    self.rng.choice(groups) if (
+                        groups and self.rng.random() < 0.7) else None,
+                    self.date(offset),
+                )
+                if pool:
+                    if self.rng.random() < images_share:
+                        row += self.rng.choice(pool)
+                    else:
+                        row += ('', None, None, '', None, '', '')
+                yield row
+
+        ids = Inserter(Post, fields).insert(rows(), self.batch_size)
+        self.report(Post, ids)
+        return ids
+
+    def seed_comments(self, count, users, posts):
+        if not posts:
+            return
+        rows = (
+            (
+                self.text(1, 2),
+                self.rng.choice(posts),
+                self.rng.choice(users),
+                self.date(self.rng.randrange(365 * 24 * 3600)),
+            )
+            for _ in range(count)
+        )
+        ids = Inserter(Comment, ('text', 'post', 'author', 'pub_date')).insert(
+            rows, self.batch_size)
+        opts = Comment._meta
+        quote = connection.ops.quote_name
+        sql = 'UPDATE {} SET {} = %s WHERE {} = %s'.format(
+            quote(opts.db_table),
+            quote(opts.get_field('path').column),
+            quote(opts.pk.column)
+        )
+        # Все сгенерированные комментарии - корни веток
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(ids), self.batch_size):
+                cursor.executemany(
+                    sql,
+                    [
+                        (f'{pk:0{PATH_SEGMENT}d}', pk)
+                        for pk in ids[start:start + self.batch_size]
+                    ]
+                )
+        self.report(Comment, ids)
+
+    def seed_follows(self, users, per_user, popularity):
+        """
+        Популярность авторов по степенному закону: автор с рангом r
+        получает вес 1 / r ** popularity, число подписок у пользователя
+        распределено по Парето.
+        """
+        authors = list(users)
+        self.rng.shuffle(authors)
+        cum_weights = list(itertools.accumulate(
+            1 / rank ** popularity for rank in range(1, len(authors) + 1)))
+
+        def rows():
+            for user in users:
+                wanted = round(per_user * (self.rng.paretovariate(2) - 1))
+                wanted = min(wanted, len(authors) - 1)
+                if wanted <= 0:
+                    continue
+                chosen = set(self.rng.choices(
+                    authors, cum_weights=cum_weights, k=wanted))
+                chosen.discard(user)
+                for author in sorted(chosen):
+                    yield (user, author)
+
+        ids = Inserter(Follow, ('user', 'author')).insert(
+            rows(), self.batch_size)
+        self.report(Follow, ids)
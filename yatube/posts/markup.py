@@ -0,0 +1,150 @@
+import re
+from html import escape
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+# Меняется при любой правке разметки: посты со старой версией
+# перерисовывает команда render_markup
+MARKUP_VERSION = 1
+
+FENCE = '```'
+HEADING = re.compile(r'(#{1,3}) +(.+)')
+LIST_ITEM = re.compile(r'[-*] +(.+)')
+QUOTE = re.compile(r'> ?(.*)')
+INLINE = re.compile(
+    r'`(?P<code>[^`\n]+)`'
+    r'|\[(?P<label>[^\]\n]+)\]\((?P<href>https?://[^\s)]+)\)'
+    r'|(?P<url>https?://[^\s<>"]*[^\s<>".,;:!?)\]])'
+    r'|(?<![\w@])@(?P<mention>[\w.+-]*[\w+-])'
+    r'|\*\*(?P<strong>[^*\n]+?)\*\*'
+    r'|\*(?P<em>[^*\n]+?)\*'
+    r'|(?<!\w)_(?P<em_>[^_\n]+?)_(?!\w)'
+)
+MENTION = re.compile(r'(?<![\w@])@([\w.+-]*[\w+-])')
+
+
+def link(href, label):
+    return (
+        f'<a href="{escape(href)}" rel="nofollow noopener">{label}</a>')
+
+
+def inline(text, users):
+    """Строчная разметка; всё, что не разметка, экранируется."""
+    parts = []
+    position = 0
+    for match in INLINE.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        position = match.end()
+        kind = match.lastgroup
+        if kind == 'code':
+            parts.append(f'<code>{escape(match["code"])}</code>')
+        elif kind in ('label', 'href'):
+            parts.append(link(match['href'], escape(match['label'])))
+        elif kind == 'url':
+            parts.append(link(match['url'], escape(match['url'])))
+        elif kind == 'mention':
+            username = match['mention']
+            if username in users:
+                parts.append(link(
+                    reverse('posts:profile', args=[username]),
+                    escape(f'@{username}')
+                ))
+            else:
+                parts.append(escape(match.group()))
+        elif kind == 'strong':
+            parts.append(f'<strong>{inline(match[kind], users)}</strong>')
+        else:
+            parts.append(f'<em>{inline(match[kind], users)}</em>')
+    parts.append(escape(text[position:]))
+    return ''.join(parts)
+
+
+def line_kind(line):
+    """Тип строки: fence, blank и heading - отдельные блоки, прочие копятся."""
+    if line.strip() == FENCE:
+        return 'fence'
+    if not line.strip():
+        return 'blank'
+    if HEADING.fullmatch(line):
+        return 'heading'
+    if LIST_ITEM.fullmatch(line):
+        return 'list'
+    if QUOTE.fullmatch(line):
+        return 'quote'
+    return 'paragraph'
+
+
+def fenced(lines):
+    """Строки блока кода до закрывающего ```."""
+    code = []
+    for line in lines:
+        if line.strip() == FENCE:
+            break
+        code.append(line)
+    return code
+
+
+def blocks(lines):
+    """Режет строки на блоки (тип, строки) по пустым строкам и маркерам."""
+    kind, block = None, []
+    lines = iter(lines)
+    for line in lines:
+        current = line_kind(line)
+        if block and current != kind:
+            yield kind, block
+            kind, block = None, []
+        if current == 'fence':
+            yield 'code', fenced(lines)
+        elif current == 'heading':
+            yield 'heading', [line]
+        elif current != 'blank':
+            kind = current
+            block.append(line)
+    if block:
+        yield kind, block
+
+
+def mentioned_users(text):
+    names = set(MENTION.findall(text))
+    if not names:
+        return set()
+    return set(
+        get_user_model().objects
+        .filter(username__in=names)
+        .values_list('username', flat=True)
+    )
+
+
+def render(text, users=None):
+    """
+    Markdown-подмножество в безопасный HTML: абзацы, заголовки, списки,
+    цитаты, блоки кода, выделение, ссылки, автоссылки и упоминания
+    @username. Сырой HTML не пропускается - весь текст экранируется.
+    users - существующие имена для упоминаний, по умолчанию ищутся в БД.
+    """
+    if users is None:
+        users = mentioned_users(text)
+    html = []
+    for kind, lines in blocks(text.replace('\r\n', '\n').split('\n')):
+        if kind == 'code':
+            html.append(
+                '<pre><code>{}</code></pre>'.format(escape('\n'.join(lines))))
+        elif kind == 'heading':
+            marks, title = HEADING.fullmatch(lines[0]).groups()
+            level = len(marks) + 2
+            html.append(f'<h{level}>{inline(title, users)}</h{level}>')
+        elif kind == 'list':
+            html.append('<ul>{}</ul>'.format(''.join(
+                f'<li>{inline(LIST_ITEM.fullmatch(line)[1], users)}</li>'
+                for line in lines
+            )))
+        elif kind == 'quote':
+            html.append('<blockquote><p>{}</p></blockquote>'.format(
+                '<br>'.join(
+                    inline(QUOTE.fullmatch(line)[1], users) for line in lines
+                )))
+        else:
+            html.append('<p>{}</p>'.format(
+                '<br>'.join(inline(line, users) for line in lines)))
+    return '\n'.join(html)
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:39
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_auto_20230212_2345'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'verbose_name': 'Подписка', 'verbose_name_plural': 'Подписки'},
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, help_text='Загрузите заглавную картинку поста', storage=posts.storage.HashedImageStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:55
+
+from django.db import migrations, models
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    for post in Post.objects.only('pk', 'text').iterator():
+        excerpt = post.text
+        if len(excerpt) > 300:
+            excerpt = excerpt[:300]
+            space = excerpt.rfind(' ')
+            if space > 150:
+                excerpt = excerpt[:space]
+            excerpt = excerpt.rstrip()
+        Post.objects.filter(pk=post.pk).update(
+            excerpt=excerpt, text_length=len(post.text))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Анонс'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_length',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Длина текста'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations
+from posts.markup import MARKUP_VERSION, MENTION, render
+
+
+def render_markup(apps, schema_editor):
+    """HTML для постов, созданных до появления разметки."""
+    Post = apps.get_model('posts', 'Post')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    posts = Post.objects.filter(markup_version=0).only('pk', 'text', 'excerpt')
+    for post in posts.iterator():
+        users = set(
+            User.objects
+            .filter(username__in=set(MENTION.findall(post.text)))
+            .values_list('username', flat=True)
+        )
+        Post.objects.filter(pk=post.pk).update(
+            text_html=render(post.text, users),
+            excerpt_html=render(post.excerpt, users),
+            markup_version=MARKUP_VERSION,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_feedcursor'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_markup, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,32 @@
+import json
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
+from posts.images import empty_metadata, image_metadata
+from posts.markup import MARKUP_VERSION, mentioned_users, render
+from posts.storage import hashed_image_storage
 
 User = get_user_model()
 
+# Длина одного сегмента пути комментария: id с ведущими нулями
+PATH_SEGMENT = 10
+# Длина анонса поста в списках
+EXCERPT_LENGTH = 300
+
+
+def make_excerpt(text):
+    """Начало текста не длиннее EXCERPT_LENGTH, обрезанное по слову."""
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    excerpt = text[:EXCERPT_LENGTH]
+    space = excerpt.rfind(' ')
+    if space > EXCERPT_LENGTH // 2:
+        excerpt = excerpt[:space]
+    return excerpt.rstrip()
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -34,6 +57,32 @@ class Post(CreatedModel):
         verbose_name='Текст поста',
         help_text='Введите текст поста'
     )
+    excerpt = models.CharField(
+        max_length=EXCERPT_LENGTH,
+        verbose_name='Анонс',
+        editable=False,
+        blank=True
+    )
+    text_length = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Длина текста',
+        editable=False
+    )
+    text_html = models.TextField(
+        verbose_name='HTML текста',
+        editable=False,
+        blank=True
+    )
+    excerpt_html = models.TextField(
+        verbose_name='HTML анонса',
+        editable=False,
+        blank=True
+    )
+    markup_version = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Версия разметки',
+        editable=False
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -55,8 +104,42 @@ class Post(CreatedModel):
         verbose_name='Картинка',
         help_text='Загрузите заглавную картинку поста',
         upload_to='posts/',
+        storage=hashed_image_storage,
+        db_index=True,
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
+        blank=True,
+        null=True
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        blank=True,
+        null=True
+    )
+    image_format = models.CharField(
+        max_length=10,
+        verbose_name='Формат картинки',
+        blank=True
+    )
+    image_size = models.PositiveIntegerField(
+        verbose_name='Размер картинки в байтах',
+        blank=True,
+        null=True
+    )
+    image_placeholder = models.TextField(
+        verbose_name='Превью картинки',
+        blank=True
+    )
+    image_variants = models.TextField(
+        verbose_name='Варианты картинки',
+        blank=True
+    )
+    likes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Лайки'
+    )
 
     class Meta:
         ordering = ('-pub_date',)
@@ -66,6 +149,64 @@ class Post(CreatedModel):
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # В списках text отложен, пересчитываем анонс только по загруженному
+        if 'text' not in self.get_deferred_fields():
+            self.excerpt = make_excerpt(self.text)
+            self.text_length = len(self.text)
+            self.render_markup()
+        if not self.image:
+            for field, value in empty_metadata().items():
+                setattr(self, field, value)
+        elif not self.image._committed:
+            self.image.save(self.image.name, self.image.file, save=False)
+            for field, value in image_metadata(self.image).items():
+                setattr(self, field, value)
+        super().save(*args, **kwargs)
+
+    def render_markup(self, users=None):
+        if users is None:
+            users = mentioned_users(self.text)
+        self.text_html = render(self.text, users)
+        self.excerpt_html = render(self.excerpt, users)
+        self.markup_version = MARKUP_VERSION
+
+    @property
+    def truncated(self):
+        return self.text_length > len(self.excerpt)
+
+    @property
+    def variants(self):
+        if self.image_variants:
+            return json.loads(self.image_variants)
+        return None
+
+
+class CommentQuerySet(models.QuerySet):
+    def thread_page(self, after=None, limit=None):
+        """
+        Страница веток комментариев после курсора after.
+        Ветки целиком приходят одним запросом по индексу (post, path)
+        в порядке обхода дерева.
+        """
+        limit = limit or settings.COMMENT_THREADS_IN_PAGE
+        roots = self.filter(depth=0)
+        if after:
+            roots = roots.filter(path__gt=after)
+        bounds = list(
+            roots.order_by('path').values_list('path', flat=True)[:limit + 1])
+        if not bounds:
+            return [], None
+        comments = self.filter(path__gte=bounds[0])
+        next_cursor = None
+        if len(bounds) > limit:
+            comments = comments.filter(path__lt=bounds[limit])
+            next_cursor = bounds[limit - 1]
+        return (
+            list(comments.select_related('author').order_by('path')),
+            next_cursor
+        )
+
 
 class Comment(CreatedModel):
     text = models.TextField(
@@ -86,11 +227,52 @@ class Comment(CreatedModel):
         verbose_name='Автор коммента',
         help_text='Выберите автора'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies',
+        verbose_name='Ответ на',
+        help_text='Выберите комментарий, на который отвечаете'
+    )
+    path = models.CharField(
+        max_length=255,
+        default='',
+        editable=False,
+        verbose_name='Путь в ветке'
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Глубина'
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
+        ordering = ('path',)
+        indexes = (
+            models.Index(fields=('post', 'path'), name='comment_thread_idx'),
+        )
         verbose_name = 'Коммент'
         verbose_name_plural = 'Комменты'
 
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            return super().save(*args, **kwargs)
+        prefix = ''
+        if self.parent_id is not None:
+            # Ответы глубже COMMENT_MAX_DEPTH встают рядом с родителем
+            prefix = self.parent.path[
+                :(settings.COMMENT_MAX_DEPTH - 1) * PATH_SEGMENT]
+            self.parent_id = int(prefix[-PATH_SEGMENT:])
+        super().save(*args, **kwargs)
+        self.path = f'{prefix}{self.pk:0{PATH_SEGMENT}d}'
+        self.depth = len(self.path) // PATH_SEGMENT - 1
+        Comment.objects.filter(pk=self.pk).update(
+            path=self.path, depth=self.depth, parent=self.parent_id)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -121,3 +303,137 @@ class Follow(models.Model):
     def __str__(self):
         return (f'Подписчик {self.user.username},'
                 f'автор {self.author.username}')
+
+
+class FeedCursor(models.Model):
+    """
+    Докуда пользователь дочитал ленту подписок. Счетчик unread
+    растет на единицу при каждом новом посте его авторов
+    и обнуляется, когда он открывает ленту.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_cursor',
+        verbose_name='Пользователь'
+    )
+    last_seen = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Последний прочитанный пост'
+    )
+    unread = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Непрочитанных постов'
+    )
+
+    class Meta:
+        verbose_name = 'Курсор ленты подписок'
+        verbose_name_plural = 'Курсоры ленты подписок'
+
+
+class Like(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пользователь'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_like'
+            ),
+        )
+        verbose_name = 'Лайк'
+        verbose_name_plural = 'Лайки'
+
+
+class LikeDelta(models.Model):
+    """
+    Буфер изменений счетчика лайков. Лайк добавляет строку вместо
+    обновления строки поста, команда flush_likes сворачивает буфер
+    в Post.likes_count.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    delta = models.SmallIntegerField(verbose_name='Изменение')
+
+    class Meta:
+        verbose_name = 'Изменение счетчика лайков'
+        verbose_name_plural = 'Изменения счетчиков лайков'
+
+
+class Upload(models.Model):
+    """Загрузка картинки по частям, на которую ссылается PostForm."""
+    token = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+        verbose_name='Токен'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='uploads',
+        verbose_name='Пользователь'
+    )
+    filename = models.CharField(max_length=255, verbose_name='Имя файла')
+    size = models.PositiveIntegerField(verbose_name='Размер')
+    received = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Получено байт'
+    )
+    completed = models.BooleanField(default=False, verbose_name='Собрана')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Начата')
+
+    class Meta:
+        verbose_name = 'Загрузка'
+        verbose_name_plural = 'Загрузки'
+
+
+class Suggestion(models.Model):
+    """
+    Рекомендация автора для подписки. Таблицу целиком пересобирает
+    команда build_suggestions, страницы читают ее по индексу (user, rank).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+    score = models.PositiveIntegerField(
+        verbose_name='Общих подписок',
+        help_text='0 - автор предложен по популярности'
+    )
+
+    class Meta:
+        ordering = ('user', 'rank')
+        indexes = (
+            models.Index(
+                fields=('user', 'rank'),
+                name='suggestion_user_rank_idx'
+            ),
+        )
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
@@ -0,0 +1,156 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from sorl.thumbnail import delete as delete_image
+from posts import autocomplete, feeds, live
+from posts.groups import registry as groups
+from posts.models import FeedCursor, Group, Post
+
+User = get_user_model()
+
+
+def release_image(image):
+    """
+    Картинки общие для постов с одинаковым содержимым,
+    файл удаляется, когда на него не ссылается ни один пост.
+    Проверка и удаление - после коммита: при откате файл остается,
+    а пост, сохраненный за это время с тем же файлом, его удержит.
+    """
+    if not image:
+        return
+
+    def release():
+        if not Post.objects.filter(image=image.name).exists():
+            delete_image(image)
+
+    transaction.on_commit(release)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, **kwargs):
+    instance._old_image = None
+    instance._old_group_id = None
+    if instance.pk is None:
+        return
+    old_values = Post.objects.filter(
+        pk=instance.pk).values_list('image', 'group_id').first()
+    if old_values is None:
+        return
+    old_image, instance._old_group_id = old_values
+    if old_image and old_image != instance.image.name:
+        instance._old_image = Post(image=old_image).image
+
+
+@receiver(post_save, sender=Post)
+def release_old_image(sender, instance, **kwargs):
+    release_image(instance._old_image)
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: live.publish(instance))
+
+
+def count_unread(post):
+    """Один UPDATE по подписчикам автора вместо COUNT на каждой странице."""
+    FeedCursor.objects.filter(
+        user__follower__author_id=post.author_id
+    ).update(unread=F('unread') + 1)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: count_unread(instance))
+
+
+def mark_post_files(post, created):
+    """Помечает sitemap и ленты, в которые попадает пост."""
+    names = {'feed', feeds.shard_name(post.pk)}
+    if created:
+        names.update({'sitemap', 'sitemap-pages'})
+    names.add(f'feed-author-{post.author.username}')
+    for group_id in (post.group_id, getattr(post, '_old_group_id', None)):
+        group = groups.get(group_id) if group_id else None
+        if group is not None:
+            names.add(f'feed-group-{group.slug}')
+    transaction.on_commit(lambda: feeds.mark_dirty(*names))
+
+
+@receiver(post_save, sender=Post)
+def mark_saved_post(sender, instance, created, **kwargs):
+    mark_post_files(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def mark_deleted_post(sender, instance, **kwargs):
+    mark_post_files(instance, created=True)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    release_image(instance.image)
+
+
+@receiver(pre_save, sender=Group)
+def remember_old_slug(sender, instance, **kwargs):
+    instance._old_slug = None
+    if instance.pk is not None:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_groups(sender, instance, **kwargs):
+    # Свой процесс видит изменение сразу, остальные - после коммита
+    groups.forget()
+    autocomplete.groups_index.forget()
+    transaction.on_commit(groups.invalidate)
+    names = {'sitemap-pages', f'feed-group-{instance.slug}'}
+    # Лента под старым slug пересоберется пустой и удалится
+    old_slug = getattr(instance, '_old_slug', None)
+    if old_slug:
+        names.add(f'feed-group-{old_slug}')
+    transaction.on_commit(lambda: feeds.mark_dirty(*names))
+
+
+def invalidate_user_index():
+    # Свой процесс видит изменение сразу, остальные - после коммита
+    autocomplete.users.forget()
+    transaction.on_commit(autocomplete.users.invalidate)
+
+
+def username_changes(update_fields):
+    # Вход обновляет только last_login - имя при этом не меняется
+    return update_fields is None or 'username' in update_fields
+
+
+@receiver(pre_save, sender=User)
+def remember_old_username(sender, instance, update_fields, **kwargs):
+    instance._old_username = None
+    if instance.pk is not None and username_changes(update_fields):
+        instance._old_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_usernames(sender, instance, created, update_fields, **kwargs):
+    if created or username_changes(update_fields):
+        invalidate_user_index()
+    old_username = getattr(instance, '_old_username', None)
+    if old_username and old_username != instance.username:
+        names = (
+            'sitemap-pages',
+            f'feed-author-{old_username}',
+            f'feed-author-{instance.username}',
+        )
+        transaction.on_commit(lambda: feeds.mark_dirty(*names))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_username(sender, instance, **kwargs):
+    invalidate_user_index()
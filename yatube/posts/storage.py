@@ -0,0 +1,63 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+
+@deconstructible
+class HashedImageStorage(FileSystemStorage):
+    """
+    Хранит файлы под именем sha256 от содержимого:
+    upload_to/ab/abcdef....jpg.
+    Одинаковые картинки хранятся один раз, а имя никогда не
+    переиспользуется для другого содержимого.
+    """
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def hashed_name(self, name, hexdigest):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            directory, hexdigest[:2], f'{hexdigest}{extension}')
+
+    def _save(self, name, content):
+        directory = self.path(posixpath.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        if hasattr(content, 'temporary_file_path'):
+            os.close(fd)
+            for chunk in content.chunks():
+                digest.update(chunk)
+            file_move_safe(
+                content.temporary_file_path(), tmp_path, allow_overwrite=True)
+        else:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+        name = self.hashed_name(name, digest.hexdigest())
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(tmp_path)
+            return name
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(tmp_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    @staticmethod
+    def is_hashed(name):
+        return bool(HASHED_NAME_RE.search(name))
+
+
+hashed_image_storage = HashedImageStorage()
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template import engines
+from posts.groups import registry as groups
+
+# Место карточек постов в шаблоне страницы, отрендеренном со streamed
+STREAM_MARKER = '<!-- posts -->'
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def page_ids(page_obj):
+    """Id постов страницы: у ленивой страницы - без загрузки самих постов."""
+    object_list = page_obj.object_list
+    if hasattr(object_list, 'values_list'):
+        return list(object_list.values_list('pk', flat=True))
+    return [post.pk for post in object_list]
+
+
+def with_group(post):
+    if post.group_id is not None:
+        post.group = groups.get(post.group_id)
+    return post
+
+
+def iterate_posts(page_obj):
+    """
+    Посты страницы по одному через iterator(): в памяти не лежит
+    вся страница. Группы берутся из реестра, как в attach_groups.
+    Запрос привязывается сразу, а выполняется при отдаче первой карточки.
+    """
+    return map(with_group, page_obj.object_list.iterator())
+
+
+def stream_page(request, template_name, context, card, posts):
+    """
+    Отдает страницу ленты частями: все до первого поста уходит сразу,
+    затем по карточке на каждый пост из posts по мере чтения из БД,
+    затем пагинатор и подвал. Шаблон страницы рендерится один раз
+    со streamed и режется по STREAM_MARKER.
+    """
+    engine = engines[settings.POSTS_TEMPLATE_ENGINE]
+    page = engine.get_template(template_name).render(
+        dict(context, streamed=True), request)
+    head, tail = page.split(STREAM_MARKER, 1)
+    card_template = engine.get_template(CARD_TEMPLATE)
+
+    def chunks():
+        yield head
+        for number, post in enumerate(posts):
+            yield card_template.render(
+                dict(context, post=post, card=card, first=number == 0))
+        yield tail
+
+    return StreamingHttpResponse(chunks())
@@ -0,0 +1,108 @@
+import heapq
+import multiprocessing
+from array import array
+from bisect import bisect_left
+
+from django.contrib.auth import get_user_model
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraph:
+    """
+    Граф подписок в плотных массивах (CSR): пользователи пронумерованы
+    по возрастанию pk, подписки i-го лежат в targets[offsets[i]:
+    offsets[i + 1]]. На ребро уходит 4 байта вместо объекта на строку.
+    """
+    def __init__(self, nodes, offsets, targets):
+        self.nodes = nodes
+        self.offsets = offsets
+        self.targets = targets
+        self.popularity = array('i', bytes(4 * len(nodes)))
+        for target in targets:
+            self.popularity[target] += 1
+        self.popular = array('i', sorted(
+            (node for node in range(len(nodes)) if self.popularity[node]),
+            key=lambda node: (-self.popularity[node], node)
+        ))
+
+    @classmethod
+    def load(cls, batch_size=10000):
+        nodes = array('i', User.objects.order_by('pk').values_list(
+            'pk', flat=True).iterator(chunk_size=batch_size))
+        offsets = array('q', bytes(8 * (len(nodes) + 1)))
+        targets = array('i')
+        edges = Follow.objects.order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id').iterator(chunk_size=batch_size)
+        for user_id, author_id in edges:
+            offsets[bisect_left(nodes, user_id) + 1] += 1
+            targets.append(bisect_left(nodes, author_id))
+        for node in range(len(nodes)):
+            offsets[node + 1] += offsets[node]
+        return cls(nodes, offsets, targets)
+
+    def following(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def suggest(self, node, count):
+        """
+        Авторы, на которых подписаны авторы из подписок node, по числу
+        таких общих подписок; недостающие места - самые популярные.
+        """
+        known = set(self.following(node))
+        known.add(node)
+        mutual = {}
+        for followed in self.following(node):
+            for candidate in self.following(followed):
+                if candidate not in known:
+                    mutual[candidate] = mutual.get(candidate, 0) + 1
+        best = heapq.nlargest(count, mutual, key=lambda candidate: (
+            mutual[candidate], self.popularity[candidate], -candidate))
+        result = [(candidate, mutual[candidate]) for candidate in best]
+        for candidate in self.popular:
+            if len(result) >= count:
+                break
+            if candidate not in known and candidate not in mutual:
+                result.append((candidate, 0))
+        return result
+
+
+# Граф воркера: передается один раз при старте процесса пула
+_graph = None
+
+
+def _init_worker(graph):
+    global _graph
+    _graph = graph
+
+
+def _suggest_range(task):
+    start, stop, count = task
+    rows = []
+    for node in range(start, stop):
+        for rank, (candidate, score) in enumerate(
+                _graph.suggest(node, count), 1):
+            rows.append((
+                _graph.nodes[node], _graph.nodes[candidate], rank, score))
+    return rows
+
+
+def suggest_all(graph, count, processes=1, chunk_size=1000):
+    """
+    Рекомендации для всех пользователей: пачки строк
+    (user_id, author_id, rank, score) по диапазонам пользователей.
+    """
+    tasks = [
+        (start, min(start + chunk_size, len(graph.nodes)), count)
+        for start in range(0, len(graph.nodes), chunk_size)
+    ]
+    if processes > 1:
+        with multiprocessing.Pool(
+                processes, initializer=_init_worker,
+                initargs=(graph,)) as pool:
+            yield from pool.imap(_suggest_range, tasks)
+        return
+    _init_worker(graph)
+    for task in tasks:
+        yield _suggest_range(task)
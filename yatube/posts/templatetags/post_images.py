@@ -0,0 +1,29 @@
+from django import template
+from django.conf import settings
+from posts.images import image_variants
+
+
+register = template.Library()
+
+
+def image_context(post, lazy=True):
+    """Контекст posts/includes/post_image.html, общий для Django и Jinja2."""
+    if not post.image:
+        return {}
+    variants = post.variants or image_variants(post.image)
+    width, height = settings.POST_IMAGE_SIZE
+    return {
+        'webp': variants.get('webp'),
+        'jpeg': variants['jpeg'],
+        'src': variants['jpeg'][-1][0],
+        'sizes': settings.POST_IMAGE_SIZES,
+        'width': width,
+        'height': height,
+        'placeholder': post.image_placeholder,
+        'lazy': lazy,
+    }
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, lazy=True):
+    return image_context(post, lazy)
@@ -0,0 +1,107 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.db.models import F
+from core import invalidation
+from posts import autocomplete, feeds
+from posts.groups import registry as groups
+from posts.markup import MARKUP_VERSION
+from posts.models import Comment, Follow, Group, Post, Suggestion, User
+
+
+class SeedCommandTest(TestCase):
+    def seed(self):
+        call_command(
+            'seed', users=20, groups=3, posts=50, comments=30,
+            follows_per_user=3, stdout=StringIO()
+        )
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'author__username', 'author__password',
+                'group__slug', 'pub_date')),
+            list(Follow.objects.order_by('pk').values_list(
+                'user__username', 'author__username')),
+        )
+
+    def test_seed_creates_requested_rows(self):
+        """Команда seed создает заданное количество записей"""
+        self.seed()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertFalse(
+            Follow.objects.filter(user=F('author')).exists())
+
+    def test_seed_is_deterministic(self):
+        """Одинаковый seed дает одинаковые данные"""
+        first = self.seed()
+        for model in (Follow, Comment, Post, Group, User):
+            model.objects.all().delete()
+        self.assertEqual(self.seed(), first)
+
+    def test_seed_notifies_running_processes(self):
+        """seed меняет метки групп и имен и помечает ленты устаревшими"""
+        stamps = (groups.name, autocomplete.users.stamp)
+        before = [invalidation.version(stamp) for stamp in stamps]
+        self.seed()
+        for stamp, version in zip(stamps, before):
+            with self.subTest(stamp=stamp):
+                self.assertNotEqual(invalidation.version(stamp), version)
+        self.assertTrue(
+            {'feed', 'sitemap', 'sitemap-pages', 'sitemap-0'}
+            <= set(feeds.dirty_names()))
+
+
+class RenderMarkupCommandTest(TestCase):
+    def test_stale_posts_are_rerendered(self):
+        """render_markup перерисовывает только посты старой версии"""
+        user = User.objects.create_user(username='writer')
+        stale = Post.objects.create(author=user, text='**жирный**')
+        fresh = Post.objects.create(author=user, text='обычный')
+        Post.objects.filter(pk=stale.pk).update(
+            text_html='', excerpt_html='', markup_version=0)
+        out = StringIO()
+        call_command('render_markup', stdout=out)
+        self.assertIn('Перерисовано постов: 1', out.getvalue())
+        stale.refresh_from_db()
+        self.assertEqual(stale.text_html, '<p><strong>жирный</strong></p>')
+        self.assertEqual(stale.markup_version, MARKUP_VERSION)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.text_html, '<p>обычный</p>')
+
+
+class BuildSuggestionsCommandTest(TestCase):
+    def setUp(self):
+        self.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('a', 'b', 'c', 'd', 'e', 'f')
+        }
+        for user, author in (
+            ('a', 'b'), ('a', 'c'), ('b', 'd'),
+            ('c', 'd'), ('c', 'e'), ('d', 'e'),
+        ):
+            Follow.objects.create(
+                user=self.users[user], author=self.users[author])
+
+    def suggestions(self, name):
+        return list(
+            Suggestion.objects.filter(user=self.users[name])
+            .order_by('rank').values_list('author__username', 'score'))
+
+    def test_mutual_follows_then_popular(self):
+        """Сначала авторы общих подписок, затем популярные"""
+        call_command('build_suggestions', count=3, stdout=StringIO())
+        self.assertEqual(self.suggestions('a'), [('d', 2), ('e', 1)])
+        self.assertEqual(
+            self.suggestions('f'), [('d', 0), ('e', 0), ('b', 0)])
+        rows = list(Suggestion.objects.values_list(
+            'user', 'author', 'rank', 'score'))
+        call_command(
+            'build_suggestions', count=3, processes=2, chunk_size=2,
+            stdout=StringIO())
+        self.assertEqual(
+            list(Suggestion.objects.values_list(
+                'user', 'author', 'rank', 'score')),
+            rows
+        )
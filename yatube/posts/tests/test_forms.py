@@ -1,3 +1,4 @@
+import hashlib
 import tempfile
 import shutil
 from django.conf import settings
@@ -5,7 +6,7 @@ from django.test import TestCase, Client, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from posts.models import Post, Group, Comment
+from posts.models import Post, Group, Comment, Upload
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -69,15 +70,74 @@ class PostCreateTest(TestCase):
             response,
             reverse('posts:profile', kwargs={'username': 'Nikita'}))
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 author=PostCreateTest.user.id,
                 text='Пост формы',
                 group=PostCreateTest.group.id,
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).exists()
         )
 
+    def upload_in_chunks(self, content, filename):
+        state = self.authorized_client.post(
+            reverse('posts:upload_start'),
+            {'filename': filename, 'size': len(content)}
+        ).json()
+        url = reverse(
+            'posts:upload_chunk', kwargs={'token': state['token']})
+        for offset in range(0, len(content), 20):
+            state = self.authorized_client.post(
+                f'{url}?offset={offset}',
+                data=content[offset:offset + 20],
+                content_type='application/octet-stream'
+            ).json()
+        self.assertEqual(state['received'], len(content))
+        response = self.authorized_client.post(
+            reverse('posts:upload_complete',
+                    kwargs={'token': state['token']}),
+            {'sha256': hashlib.sha256(content).hexdigest()}
+        )
+        self.assertTrue(response.json()['completed'])
+        return state['token']
+
+    def test_post_create_with_chunked_upload(self):
+        """Пост создается из картинки, загруженной по частям"""
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        with override_settings(CHUNKED_UPLOAD_DIR=TEMP_MEDIA_ROOT):
+            token = self.upload_in_chunks(small_gif, 'big.png')
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'text': 'Пост из частей', 'upload_token': token}
+            )
+        post = Post.objects.get(text='Пост из частей')
+        self.assertEqual(post.image_size, len(small_gif))
+        self.assertTrue(post.image.name.endswith('.gif'))
+        self.assertFalse(Upload.objects.exists())
+
+    def test_chunked_upload_must_be_image(self):
+        """Загрузка по частям проверяется как картинка"""
+        payload = b'<html><script>alert(1)</script></html>' * 3
+        with override_settings(CHUNKED_UPLOAD_DIR=TEMP_MEDIA_ROOT):
+            token = self.upload_in_chunks(payload, 'x.html')
+            response = self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'text': 'Пост с html', 'upload_token': token}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, 'form', 'upload_token',
+            'Загрузите правильное изображение')
+        self.assertFalse(Post.objects.filter(text='Пост с html').exists())
+
     def test_post_edit(self):
         """
         Валидная форма редактирует пост
@@ -132,3 +192,16 @@ class CommentCreateTest(TestCase):
                 author=self.user.id
             ).exists()
         )
+
+    def test_reply_create(self):
+        """Ответ на коммент попадает в ветку родителя"""
+        parent = Comment.objects.create(
+            text='Родитель', post=self.post, author=self.user)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Ответ', 'parent': parent.id}
+        )
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent, parent)
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(reply.path.startswith(parent.path))
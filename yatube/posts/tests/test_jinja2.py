@@ -0,0 +1,112 @@
+import re
+import shutil
+import tempfile
+from importlib.util import find_spec
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, Suggestion
+from yatube.settings import POSTS_IN_PAGE
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def normalize(html):
+    """Пробелы между тегами у движков разные, кавычки экранируются иначе."""
+    html = html.replace('&#34;', '&quot;')
+    html = re.sub(r'\s+', ' ', html)
+    return re.sub(r'>\s+<', '><', html).strip()
+
+
+@skipUnless(find_spec('jinja2'), 'jinja2 не установлен')
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class JinjaParityTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа <и> "кавычки"', description='Описание', slug='g')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                text=f'Пост {number} с **разметкой** & <тегами>',
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(POSTS_IN_PAGE + 1)
+        ]
+        cls.posts.append(Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой ' + 'слово ' * 80,
+            group=cls.group,
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'),
+        ))
+        Comment.objects.create(
+            post=cls.posts[-1], author=cls.reader, text='Коммент <b>')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Suggestion.objects.create(
+            user=cls.reader, author=cls.author, rank=1, score=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def render(self, engine, url):
+        cache.clear()
+        with self.settings(POSTS_TEMPLATE_ENGINE=engine):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return normalize(b''.join(response.streaming_content).decode())
+        return normalize(response.content.decode())
+
+    def assert_parity(self, url):
+        self.assertEqual(
+            self.render('jinja2', url), self.render('django', url))
+
+    def test_public_pages(self):
+        """Публичные страницы Jinja2 совпадают с Django-шаблонами"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.posts[-1].pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assert_parity(url)
+
+    def test_follow_page(self):
+        """Лента подписок с шапкой пользователя совпадает"""
+        self.client.force_login(self.reader)
+        self.assert_parity(reverse('posts:follow_index'))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_templates', repeat=2, stdout=out)
+        for engine in ('django', 'jinja2'):
+            with self.subTest(engine=engine):
+                self.assertIn(f'{engine} posts/index.html', out.getvalue())
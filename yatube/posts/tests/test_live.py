@@ -0,0 +1,122 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from posts import live
+from posts.models import Group, Post
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+def scope(path, query):
+    return {
+        'type': 'http',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [],
+    }
+
+
+@override_settings(
+    LIVE_SOCKET=os.path.join(TEMP_DIR, 'live.sock'),
+    PUBLISH_DIR=os.path.join(TEMP_DIR, 'published'),
+    LIVE_POLL_TIMEOUT=5
+)
+class LiveTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', description='Описание', slug='live')
+        self.other = Group.objects.create(
+            title='Другая', description='Описание', slug='other')
+        self.old_post = Post.objects.create(
+            author=self.user, text='Старый пост', group=self.group)
+
+    def run_app(self, coroutine):
+        async def main():
+            await live.hub.start()
+            try:
+                return await coroutine()
+            finally:
+                live.hub.stop()
+        return asyncio.run(main())
+
+    def test_poll_waits_for_new_posts_of_feed(self):
+        """Long-poll отвечает, когда в ленте группы появился новый пост"""
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def scenario():
+            query = (
+                f'feed=group&group=live&since={self.old_post.pk - 1}&known=1')
+            request = asyncio.ensure_future(live.application(
+                scope('/live/poll/', query), receive, send))
+            while not live.hub.subscribers:
+                await asyncio.sleep(0.01)
+            Post.objects.create(
+                author=self.user, text='Чужая группа', group=self.other)
+            Post.objects.create(
+                author=self.user, text='Новый пост', group=self.group)
+            await asyncio.wait_for(request, 5)
+
+        self.run_app(scenario)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(json.loads(sent[1]['body']), {'count': 2})
+
+    def test_stream_sends_count_events(self):
+        """SSE присылает новое число постов после каждого поста"""
+        chunks = []
+        disconnect = asyncio.Event()
+
+        async def send(message):
+            chunks.append(message.get('body', b''))
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def scenario():
+            request = asyncio.ensure_future(live.application(
+                scope('/live/', 'feed=index'), receive, send))
+            while not live.hub.subscribers:
+                await asyncio.sleep(0.01)
+            Post.objects.create(author=self.user, text='Новый пост')
+            while b'{"count": 1}' not in b''.join(chunks):
+                await asyncio.sleep(0.01)
+            disconnect.set()
+            await asyncio.wait_for(request, 5)
+
+        self.run_app(scenario)
+        self.assertIn(b'event: posts\ndata: {"count": 0}', chunks[1])
+        self.assertFalse(live.hub.subscribers)
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок без сессии не отдается"""
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def scenario():
+            await live.application(
+                scope('/live/poll/', 'feed=follow'), None, send)
+
+        self.run_app(scenario)
+        self.assertEqual(sent[0]['status'], 404)
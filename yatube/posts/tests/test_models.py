@@ -1,6 +1,10 @@
+from importlib import import_module
+
+from django.apps import apps
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from posts.models import Post, Group
+from django.test import TestCase, override_settings
+from posts.markup import MARKUP_VERSION
+from posts.models import EXCERPT_LENGTH, Post, Group, Comment
 
 User = get_user_model()
 
@@ -55,6 +59,17 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, value)
 
+    def test_post_excerpt_is_stored(self):
+        """Анонс и длина текста пересчитываются при сохранении"""
+        self.assertEqual(PostModelTest.post.excerpt, 'Тестовый пост')
+        self.assertFalse(PostModelTest.post.truncated)
+        post = Post.objects.create(
+            author=PostModelTest.user, text='длинное ' * 100)
+        self.assertLessEqual(len(post.excerpt), EXCERPT_LENGTH)
+        self.assertTrue(post.text.startswith(post.excerpt))
+        self.assertEqual(post.text_length, len(post.text))
+        self.assertTrue(post.truncated)
+
 
 class GroupModelTest(TestCase):
     @classmethod
@@ -100,3 +115,99 @@ class GroupModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     group._meta.get_field(field).help_text, value)
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            text=text, post=CommentThreadTest.post,
+            author=CommentThreadTest.user, parent=parent
+        )
+
+    def test_thread_page_returns_tree_order(self):
+        """Ветки приходят в порядке обхода дерева, с курсором"""
+        first = self.comment('1')
+        second = self.comment('2')
+        self.comment('2.1', second)
+        self.comment('1.1', first)
+        self.comment('3')
+        comments, cursor = CommentThreadTest.post.comments.thread_page(
+            limit=2)
+        self.assertEqual(
+            [comment.text for comment in comments], ['1', '1.1', '2', '2.1'])
+        comments, cursor = CommentThreadTest.post.comments.thread_page(
+            after=cursor, limit=2)
+        self.assertEqual([comment.text for comment in comments], ['3'])
+        self.assertIsNone(cursor)
+
+    @override_settings(COMMENT_MAX_DEPTH=2)
+    def test_reply_depth_is_limited(self):
+        """Ответы глубже лимита встают рядом с родителем"""
+        root = self.comment('1')
+        reply = self.comment('1.1', root)
+        deep = self.comment('1.1.1', reply)
+        self.assertEqual(deep.depth, 1)
+        self.assertEqual(deep.parent_id, root.id)
+
+
+class MarkupTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_post_text_is_rendered_on_save(self):
+        """Текст поста сохраняется готовым безопасным HTML"""
+        post = Post.objects.create(
+            author=MarkupTest.user,
+            text=(
+                '# Заголовок\n'
+                'Привет, @auth и @nobody! См. https://example.com/a.\n'
+                '\n'
+                '- *раз*\n'
+                '- [два](https://example.com)\n'
+                '\n'
+                '<script>alert(1)</script>'
+            )
+        )
+        self.assertEqual(post.text_html, (
+            '<h3>Заголовок</h3>\n'
+            '<p>Привет, <a href="/profile/auth/" rel="nofollow noopener">'
+            '@auth</a> и @nobody! См. <a href="https://example.com/a" '
+            'rel="nofollow noopener">https://example.com/a</a>.</p>\n'
+            '<ul><li><em>раз</em></li><li><a href="https://example.com" '
+            'rel="nofollow noopener">два</a></li></ul>\n'
+            '<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>'
+        ))
+        self.assertEqual(post.markup_version, MARKUP_VERSION)
+
+    def test_unsafe_links_are_not_rendered(self):
+        """Ссылки с опасной схемой остаются текстом"""
+        post = Post.objects.create(
+            author=MarkupTest.user,
+            text='[клик](javascript:alert(1)) `<b>`'
+        )
+        self.assertEqual(
+            post.text_html,
+            '<p>[клик](javascript:alert(1)) <code>&lt;b&gt;</code></p>'
+        )
+
+    def test_migration_renders_existing_posts(self):
+        """Миграция заполняет HTML постов, созданных до разметки"""
+        post = Post.objects.create(author=MarkupTest.user, text='*@auth*')
+        Post.objects.filter(pk=post.pk).update(
+            text_html='', excerpt_html='', markup_version=0)
+        migration = import_module('posts.migrations.0015_render_markup')
+        migration.render_markup(apps, None)
+        post.refresh_from_db()
+        html = ('<p><em><a href="/profile/auth/" rel="nofollow noopener">'
+                '@auth</a></em></p>')
+        self.assertEqual(post.text_html, html)
+        self.assertEqual(post.excerpt_html, html)
+        self.assertEqual(post.markup_version, MARKUP_VERSION)
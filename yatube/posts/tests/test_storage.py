@@ -0,0 +1,115 @@
+import tempfile
+import shutil
+from django.conf import settings
+from django.db import transaction
+from django.test import (TestCase, TransactionTestCase, RequestFactory,
+                         override_settings)
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from core.views import serve_media
+from posts.models import Post
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedImageStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Nikita')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=HashedImageStorageTest.user,
+            image=SimpleUploadedFile(
+                name=name, content=SMALL_GIF, content_type='image/gif')
+        )
+
+    def test_same_images_are_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.storage.exists(first.image.name))
+
+    def test_hashed_image_url_is_immutable(self):
+        """Картинка отдается с годовым Cache-Control"""
+        post = self.create_post('first.gif')
+        request = RequestFactory().get(post.image.url)
+        response = serve_media(
+            request, post.image.name, document_root=TEMP_MEDIA_ROOT)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(
+            f'max-age={settings.IMMUTABLE_CACHE_TIME}',
+            response['Cache-Control']
+        )
+
+    def test_image_metadata_saved(self):
+        """Метаданные картинки сохраняются в посте при загрузке"""
+        post = Post.objects.get(pk=self.create_post('first.gif').pk)
+        self.assertEqual(post.image_width, 2)
+        self.assertEqual(post.image_height, 1)
+        self.assertEqual(post.image_format, 'GIF')
+        self.assertEqual(post.image_size, len(SMALL_GIF))
+        self.assertTrue(post.image_placeholder.startswith('data:image/jpeg'))
+        self.assertEqual(
+            len(post.variants['jpeg']), len(settings.POST_IMAGE_WIDTHS))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageReleaseTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Nikita')
+
+    def create_post(self, name):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name=name, content=SMALL_GIF, content_type='image/gif')
+        )
+
+    def test_image_deleted_with_last_post(self):
+        """Файл удаляется вместе с последним ссылающимся постом"""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        storage, name = first.image.storage, first.image.name
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_image_kept_on_rollback(self):
+        """При откате удаления поста файл остается на месте"""
+        post = self.create_post('first.gif')
+        storage, name = post.image.storage, post.image.name
+        with transaction.atomic():
+            Post.objects.get(pk=post.pk).delete()
+            self.assertTrue(storage.exists(name))
+            transaction.set_rollback(True)
+        self.assertTrue(storage.exists(name))
+        self.assertTrue(Post.objects.filter(image=name).exists())
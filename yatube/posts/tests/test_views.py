@@ -1,13 +1,23 @@
+import os
 import tempfile
 import shutil
 from django.conf import settings
-from django.test import TestCase, Client, override_settings
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.urls import reverse
 from django import forms
-from posts.models import Post, Group, Follow
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from core import invalidation
+from posts import autocomplete
+from posts.groups import registry as groups
+from posts.likes import flush_like_counters
+from posts.models import (
+    FeedCursor, Follow, Group, Like, LikeDelta, Post, Suggestion
+)
 from yatube.settings import POSTS_IN_PAGE
 
 
@@ -16,6 +26,12 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
+def page_content(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostViewsTests(TestCase):
     @classmethod
@@ -138,6 +154,15 @@ class PostViewsTests(TestCase):
                     form_field = response.context.get('form').fields.get(value)
                     self.assertIsInstance(form_field, expected)
 
+    def test_post_image_has_srcset(self):
+        """Картинка поста выводится с вариантами всех ширин"""
+        cache.clear()
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': '1'}))
+        for width in settings.POST_IMAGE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f' {width}w')
+
     def test_cache_index_page(self):
         """
         Проверяет работу кэша главной страницы
@@ -248,3 +273,413 @@ class PaginatorPostViewsTests(TestCase):
             response = self.authorized_client.get(field)
             with self.subTest(field=field):
                 self.assertEqual(len(response.context['page_obj']), value)
+
+
+class LikeViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='somebody')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(LikeViewsTests.user)
+
+    def like_url(self, name):
+        return reverse(name, kwargs={'post_id': LikeViewsTests.post.id})
+
+    def likes_count(self):
+        return Post.objects.get(pk=LikeViewsTests.post.id).likes_count
+
+    def test_likes_are_flushed_into_counter(self):
+        """Лайки копятся в буфере и переносятся в счетчик поста"""
+        self.authorized_client.post(self.like_url('posts:post_like'))
+        self.authorized_client.post(self.like_url('posts:post_like'))
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertEqual(self.likes_count(), 0)
+        flush_like_counters()
+        self.assertEqual(self.likes_count(), 1)
+        self.authorized_client.post(self.like_url('posts:post_unlike'))
+        flush_like_counters()
+        self.assertEqual(self.likes_count(), 0)
+        self.assertFalse(LikeDelta.objects.exists())
+
+    def test_like_requires_post(self):
+        """Лайк ставится и снимается только POST-запросом"""
+        for name in ('posts:post_like', 'posts:post_unlike'):
+            with self.subTest(name=name):
+                response = self.authorized_client.get(self.like_url(name))
+                self.assertEqual(response.status_code, 405)
+        self.assertFalse(Like.objects.exists())
+
+
+class GroupStampTests(TransactionTestCase):
+    def test_stamp_changes_after_commit(self):
+        """Метка групп меняется только после коммита транзакции"""
+        before = invalidation.version(groups.name)
+        with transaction.atomic():
+            Group.objects.create(
+                title='Группа', description='Описание', slug='stamp')
+            self.assertEqual(invalidation.version(groups.name), before)
+        self.assertNotEqual(invalidation.version(groups.name), before)
+
+    def test_usernames_stamp_changes_after_commit(self):
+        """Метка имен меняется только после коммита транзакции"""
+        stamp = autocomplete.users.stamp
+        before = invalidation.version(stamp)
+        with transaction.atomic():
+            user = User.objects.create_user(username='stamped')
+            self.assertEqual(invalidation.version(stamp), before)
+        created = invalidation.version(stamp)
+        self.assertNotEqual(created, before)
+        with transaction.atomic():
+            user.delete()
+            self.assertEqual(invalidation.version(stamp), created)
+        self.assertNotEqual(invalidation.version(stamp), created)
+
+
+class GroupRegistryTests(TestCase):
+    def test_registry_sees_group_changes(self):
+        """Реестр групп перечитывается после сохранения группы"""
+        group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовое описание',
+            slug='registry-slug'
+        )
+        self.assertEqual(groups.get_by_slug('registry-slug'), group)
+        group.slug = 'renamed-slug'
+        group.save()
+        self.assertIsNone(groups.get_by_slug('registry-slug'))
+        self.assertEqual(groups.get(group.pk).slug, 'renamed-slug')
+
+    def test_group_page_without_group_query(self):
+        """Страница группы не запрашивает саму группу из базы"""
+        Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовое описание',
+            slug='registry-slug'
+        )
+        groups.get_by_slug('registry-slug')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('posts:group_list', args=('registry-slug',)))
+        self.assertFalse(any(
+            'FROM "posts_group"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+
+class ExcerptViewsTests(TestCase):
+    def test_list_pages_show_excerpt(self):
+        """Списки не читают text и показывают анонс со ссылкой"""
+        cache.clear()
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='слово ' * 200)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'writer'}))
+        first_object = response.context['page_obj'][0]
+        self.assertIn('text', first_object.get_deferred_fields())
+        content = page_content(response).decode()
+        self.assertIn(post.excerpt, content)
+        self.assertIn('читать дальше', content)
+        self.assertNotIn(post.text, content)
+
+
+class PublicPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', description='Описание', slug='public')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Текст', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(PublicPagesTests.reader)
+
+    def test_public_pages_are_same_for_everyone(self):
+        """Публичные страницы не зависят от сессии и кэшируются всеми"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'public'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': PublicPagesTests.post.id}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                anonymous = self.client.get(url)
+                cache.clear()
+                response = self.reader_client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+                self.assertEqual(
+                    page_content(response), page_content(anonymous))
+
+    def test_fragments_are_personal(self):
+        """Персональные части приходят отдельным некэшируемым запросом"""
+        post = PublicPagesTests.post
+        response = self.reader_client.get(reverse('posts:fragments'), {
+            'post': post.id, 'author': 'author', 'switcher': 'index'})
+        self.assertIn('no-store', response['Cache-Control'])
+        parts = response.json()
+        self.assertIn('reader', parts['header'])
+        self.assertIn(
+            reverse('posts:profile_follow', args=['author']), parts['follow'])
+        self.assertIn(
+            reverse('posts:post_like', args=[post.id]), parts['like'])
+        self.assertIn('csrfmiddlewaretoken', parts['like'])
+        self.assertEqual(parts['edit'].strip(), '')
+        self.assertIn('csrfmiddlewaretoken', parts['comment_form'])
+        self.assertIn(reverse('posts:follow_index'), parts['switcher'])
+        self.client.force_login(PublicPagesTests.author)
+        parts = self.client.get(
+            reverse('posts:fragments'), {'post': post.id}).json()
+        self.assertIn(
+            reverse('posts:post_edit', args=[post.id]), parts['edit'])
+
+
+@override_settings(
+    PUBLISH_DIR=os.path.join(TEMP_MEDIA_ROOT, 'published'),
+    SITEMAP_SHARD_SIZE=2
+)
+class PublishedFilesTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', description='Описание', slug='published')
+        self.posts = [
+            Post.objects.create(
+                author=self.user, text=f'Пост {number}', group=self.group)
+            for number in range(3)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(settings.PUBLISH_DIR, ignore_errors=True)
+
+    def content(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_sitemap_is_sharded_by_id(self):
+        """Sitemap делится на шарды по диапазонам id"""
+        sitemap = self.content(reverse('posts:sitemap'))
+        self.assertIn(reverse('posts:sitemap_pages'), sitemap)
+        for post in self.posts:
+            shard = (post.pk - 1) // 2
+            with self.subTest(shard=shard):
+                self.assertIn(
+                    reverse('posts:sitemap_shard', args=[shard]), sitemap)
+                urls = self.content(
+                    reverse('posts:sitemap_shard', args=[shard]))
+                self.assertIn(
+                    reverse('posts:post_detail', args=[post.pk]), urls)
+                for other in self.posts:
+                    if (other.pk - 1) // 2 != shard:
+                        self.assertNotIn(reverse(
+                            'posts:post_detail', args=[other.pk]), urls)
+        pages = self.content(reverse('posts:sitemap_pages'))
+        self.assertIn(reverse('posts:group_list', args=['published']), pages)
+        self.assertIn(reverse('posts:profile', args=['author']), pages)
+        self.assertEqual(
+            self.client.get(reverse(
+                'posts:sitemap_shard', args=[(self.posts[-1].pk - 1) // 2 + 1]
+            )).status_code,
+            404
+        )
+
+    def test_feeds_are_rebuilt_only_when_marked(self):
+        """Ленты отдаются без БД, пока новый пост их не пометит"""
+        urls = [
+            reverse('posts:feed'),
+            reverse('posts:group_feed', args=['published']),
+            reverse('posts:author_feed', args=['author']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Пост 2', b''.join(
+                    response.streaming_content).decode())
+                with self.assertNumQueries(0):
+                    cached = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.status_code, 304)
+        Post.objects.create(
+            author=self.user, text='Свежий пост', group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIn('Свежий пост', self.content(url))
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:group_feed', args=['missing'])).status_code,
+            404
+        )
+
+    def test_renamed_feeds_are_not_served(self):
+        """После смены slug или имени старая лента больше не отдается"""
+        old_urls = [
+            reverse('posts:group_feed', args=['published']),
+            reverse('posts:author_feed', args=['author']),
+        ]
+        for url in old_urls:
+            self.content(url)
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.user.username = 'writer'
+        self.user.save()
+        for url in old_urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertIn('Пост 2', self.content(
+            reverse('posts:group_feed', args=['renamed'])))
+        self.assertIn('Пост 2', self.content(
+            reverse('posts:author_feed', args=['writer'])))
+
+    def test_gzip_etag_revalidates(self):
+        """Сжатый ответ тоже отвечает 304 на свой ETag"""
+        url = reverse('posts:feed')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].endswith(';gzip"'))
+        b''.join(response.streaming_content)
+        cached = self.client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for username in ('boris', 'Anna', 'andrew'):
+            User.objects.create_user(username=username)
+        cls.group = Group.objects.create(
+            title='Кошки', description='Описание', slug='cats')
+
+    def search(self, kind, query):
+        response = self.client.get(
+            reverse('posts:autocomplete', args=[kind]), {'q': query})
+        return [item['text'] for item in response.json()['results']]
+
+    def test_usernames_are_found_by_prefix(self):
+        """Имена ищутся по префиксу без учета регистра"""
+        self.assertEqual(self.search('users', 'AN'), ['andrew', 'Anna'])
+        User.objects.create_user(username='anton')
+        self.assertEqual(
+            self.search('users', 'an'), ['andrew', 'Anna', 'anton'])
+
+    def test_groups_are_found_by_slug_and_title(self):
+        """Группы ищутся по slug и по названию"""
+        self.assertEqual(self.search('groups', 'ca'), ['Кошки'])
+        self.assertEqual(self.search('groups', 'кош'), ['Кошки'])
+        self.assertEqual(
+            self.client.get(reverse(
+                'posts:autocomplete', args=['posts'])).status_code,
+            404
+        )
+
+    def test_widgets_use_autocomplete(self):
+        """Форма поста и админка подсказывают через автодополнение"""
+        url = reverse('posts:autocomplete', args=['groups'])
+        author = User.objects.get(username='boris')
+        self.client.force_login(author)
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertContains(response, f'data-autocomplete="{url}"')
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_add'))
+        self.assertContains(response, f'data-ajax--url="{url}"')
+        Follow.objects.create(user=author, author=admin)
+        response = self.client.get(
+            reverse('admin:posts_follow_changelist'), {'q': 'bor'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class SuggestionViewsTests(TestCase):
+    def test_suggestions_are_shown_until_followed(self):
+        """Рекомендации видны в ленте и пропадают после подписки"""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='writer')
+        Suggestion.objects.create(user=reader, author=author, rank=1, score=2)
+        self.client.force_login(reader)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [item.author for item in response.context['suggestions']],
+            [author]
+        )
+        parts = self.client.get(
+            reverse('posts:fragments'), {'author': 'writer'}).json()
+        self.assertIn(
+            reverse('posts:profile', args=['writer']), parts['suggestions'])
+        self.client.get(reverse('posts:profile_follow', args=['writer']))
+        self.assertFalse(Suggestion.objects.exists())
+
+
+@override_settings(PUBLISH_DIR=os.path.join(TEMP_MEDIA_ROOT, 'published'))
+class UnreadFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        shutil.rmtree(settings.PUBLISH_DIR, ignore_errors=True)
+
+    def header(self):
+        return self.client.get(reverse('posts:fragments')).json()['header']
+
+    def test_unread_count_and_markers(self):
+        """Счетчик растет с постами авторов и обнуляется в ленте"""
+        Post.objects.create(author=self.author, text='Старый пост')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'новое')
+        new = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.reader, text='Свой пост')
+        self.assertEqual(FeedCursor.objects.get().unread, 1)
+        self.assertIn('>1</span>', self.header())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'новое', count=1)
+        self.assertEqual(
+            FeedCursor.objects.get().last_seen, new.pk)
+        self.assertNotIn('badge', self.header())
+
+    def test_unread_count_is_capped(self):
+        """Больше 99 непрочитанных выводится как 99+"""
+        FeedCursor.objects.create(user=self.reader, unread=150)
+        self.assertIn('>99+</span>', self.header())
+
+
+class StreamingPagesTests(TestCase):
+    def test_list_pages_stream_post_cards(self):
+        """Шапка уходит до постов, затем по части на карточку"""
+        user = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', description='Описание', slug='stream')
+        for number in range(POSTS_IN_PAGE + 1):
+            Post.objects.create(
+                author=user, text=f'Пост номер {number}', group=group)
+        urls = (
+            reverse('posts:group_list', args=['stream']),
+            reverse('posts:profile', args=['author']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                chunks = [
+                    chunk.decode() for chunk in response.streaming_content]
+                self.assertEqual(len(chunks), POSTS_IN_PAGE + 2)
+                self.assertIn('</header>', chunks[0])
+                self.assertNotIn('Пост номер', chunks[0])
+                self.assertIn(f'Пост номер {POSTS_IN_PAGE}', chunks[1])
+                self.assertIn('pagination', chunks[-1])
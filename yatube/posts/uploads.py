@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+from posts.models import Upload
+
+READ_SIZE = 64 * 1024
+
+# Расширение сохраненного файла - по формату картинки, а не по имени
+IMAGE_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+    'BMP': '.bmp',
+}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AssembledFile(File):
+    """Собранный файл, который хранилище может переместить, а не копировать."""
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.token}.part')
+
+
+def start_upload(user, filename, size):
+    if size <= 0 or size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError('Недопустимый размер файла', status=413)
+    upload = Upload.objects.create(
+        user=user, filename=os.path.basename(filename)[:255], size=size)
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Дописывает часть с позиции offset. Уже полученные байты
+    пропускаются, поэтому повтор части после обрыва безопасен.
+    """
+    if upload.completed:
+        raise UploadError('Загрузка уже собрана', status=409)
+    if length > settings.UPLOAD_CHUNK_SIZE:
+        raise UploadError('Слишком большая часть', status=413)
+    if offset > upload.received:
+        raise UploadError('Пропущена часть файла', status=409)
+    if offset + length > upload.size:
+        raise UploadError('Файл больше заявленного размера', status=413)
+    skip = upload.received - offset
+    with open(part_path(upload), 'r+b') as part:
+        part.seek(upload.received)
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            if skip >= len(data):
+                skip -= len(data)
+                continue
+            part.write(data[skip:])
+            skip = 0
+        part.truncate()
+    received = max(upload.received, offset + length - remaining)
+    Upload.objects.filter(pk=upload.pk).update(received=received)
+    upload.received = received
+    return upload
+
+
+def complete_upload(upload, checksum):
+    if upload.received != upload.size:
+        raise UploadError('Файл загружен не полностью', status=409)
+    digest = hashlib.sha256()
+    with open(part_path(upload), 'rb') as part:
+        for data in iter(lambda: part.read(READ_SIZE), b''):
+            digest.update(data)
+    if digest.hexdigest() != checksum.lower():
+        raise UploadError('Контрольная сумма не совпала')
+    Upload.objects.filter(pk=upload.pk).update(completed=True)
+    upload.completed = True
+    return upload
+
+
+def image_name(upload):
+    """
+    Имя для собранного файла с расширением по его формату.
+    Как и ImageField, файл проверяется Pillow: не картинка
+    или неизвестный формат - UploadError.
+    """
+    try:
+        with Image.open(part_path(upload)) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise UploadError('Загрузите правильное изображение')
+    extension = IMAGE_EXTENSIONS.get(image_format)
+    if extension is None:
+        raise UploadError('Неподдерживаемый формат изображения')
+    return os.path.splitext(upload.filename)[0] + extension
+
+
+def assembled_file(upload, name):
+    return AssembledFile(open(part_path(upload), 'rb'), name=name)
+
+
+def discard_upload(upload):
+    upload.delete()
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
@@ -10,10 +10,29 @@ urlpatterns = [
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('fragments/', views.fragments, name='fragments'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
+    path('posts/<int:post_id>/unlike/', views.post_unlike,
+         name='post_unlike'),
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<uuid:token>/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:token>/complete/', views.upload_complete,
+         name='upload_complete'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('autocomplete/<str:kind>/', views.autocomplete,
+         name='autocomplete'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path('sitemap-pages.xml', views.sitemap_pages, name='sitemap_pages'),
+    path('sitemap-<int:shard>.xml', views.sitemap_shard,
+         name='sitemap_shard'),
+    path('feeds/atom.xml', views.feed, name='feed'),
+    path('feeds/group/<slug:slug>.xml', views.group_feed,
+         name='group_feed'),
+    path('feeds/author/<str:username>.xml', views.author_feed,
+         name='author_feed'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
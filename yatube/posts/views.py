@@ -1,87 +1,188 @@
+import os
+from urllib.parse import urlencode
+
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
 from django.shortcuts import redirect
+from django.http import (FileResponse, Http404, HttpResponseNotModified,
+                         JsonResponse)
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
-from posts.models import Post, Group, User, Follow
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.cache import (cache_control, cache_page,
+                                           never_cache)
+from django.views.decorators.http import require_POST
+from core.compression import compress_page
+from posts import feeds
+from posts.autocomplete import indexes
+from posts.models import (
+    FeedCursor, Follow, Like, Post, Suggestion, Upload, User
+)
+from posts.groups import attach_groups, get_group_or_404
+from posts.streaming import iterate_posts, page_ids, stream_page
+from posts.groups import registry as groups
 from posts.forms import PostForm, CommentForm
+from posts.likes import like, unlike
+from posts.live import live_url
+from posts.uploads import (UploadError, complete_upload, start_upload,
+                           write_chunk)
 from yatube.settings import POSTS_IN_PAGE, CACHE_TIME
 
+# Публичные страницы не читают сессию и одинаковы для всех,
+# персональное подгружается через fragments
+public_page = cache_control(public=True, max_age=CACHE_TIME)
+
+
+def suggested_authors(user):
+    """Рекомендации build_suggestions одним запросом по (user, rank)."""
+    return list(
+        Suggestion.objects.filter(user=user)
+        .select_related('author').order_by('rank')
+    )
+
+
+def render_page(request, template_name, context):
+    """Ленты и пост рендерит движок POSTS_TEMPLATE_ENGINE (jinja2/)."""
+    return render(
+        request, template_name, context,
+        using=settings.POSTS_TEMPLATE_ENGINE
+    )
+
+
+def fragments_url(**params):
+    return f"{reverse('posts:fragments')}?{urlencode(params)}"
+
 
 @cache_page(CACHE_TIME)
+@compress_page
+@public_page
 def index(request):
-    post_list = Post.objects.all().select_related('group','author')
+    post_list = Post.objects.defer('text').select_related('author')
     paginator = Paginator(post_list, POSTS_IN_PAGE)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = attach_groups(paginator.get_page(page_number))
     context = {
         'page_obj': page_obj,
+        'fragments': fragments_url(switcher='index'),
+        'live': live_url(page_obj, feed='index'),
     }
-    return render(request, 'posts/index.html', context)
+    return render_page(request, 'posts/index.html', context)
 
 
+@public_page
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author').all()
+    group = get_group_or_404(slug)
+    post_list = group.posts.select_related('author').defer('text')
     paginator = Paginator(post_list, POSTS_IN_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     context = {
         'group': group,
         'page_obj': page_obj,
-        'title': f'Записи сообщества {slug}'
+        'title': f'Записи сообщества {slug}',
+        'fragments': fragments_url(),
+        'live': live_url(page_obj, feed='group', group=slug),
     }
-    return render(request, 'posts/group_list.html', context)
+    return stream_page(
+        request, 'posts/group_list.html', context, 'group',
+        iterate_posts(page_obj)
+    )
 
 
+@public_page
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group').all()
+    post_list = author.posts.defer('text')
     paginator = Paginator(post_list, POSTS_IN_PAGE)
     page_namber = request.GET.get('page')
     page_obj = paginator.get_page(page_namber)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
-    else:
-        following = False
     context = {
         'page_obj': page_obj,
         'title': f'Профайл пользователя {username}',
         'author': author,
-        'following': following
+        'fragments': fragments_url(author=username),
     }
-    return render(request, 'posts/profile.html', context)
+    return stream_page(
+        request, 'posts/profile.html', context, 'profile',
+        iterate_posts(page_obj)
+    )
 
 
+@public_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post.objects.select_related('author','group'), pk=post_id)
-    comments = post.comments.all()
-    form = CommentForm()
+    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
+    if post.group_id is not None:
+        post.group = groups.get(post.group_id)
+    comments, next_cursor = post.comments.thread_page(request.GET.get('after'))
     context = {
         'post': post,
-        'form': form,
         'comments': comments,
-        'title': f'Пост {post}'
+        'next_cursor': next_cursor,
+        'title': f'Пост {post}',
+        'fragments': fragments_url(post=post.id),
     }
-    return render(request, 'posts/post_detail.html', context)
+    return render_page(request, 'posts/post_detail.html', context)
+
+
+@never_cache
+def fragments(request):
+    """
+    Персональные части публичных страниц: шапка, вкладки ленты,
+    кнопка подписки, лайк, ссылка на редактирование
+    и форма комментария с CSRF-токеном.
+    """
+    context = {}
+    templates = {'header': 'includes/header_user.html'}
+    switcher = request.GET.get('switcher')
+    if switcher in ('index', 'follow'):
+        context[switcher] = True
+        templates['switcher'] = 'posts/includes/switcher.html'
+    author = User.objects.filter(
+        username=request.GET.get('author', '')).first()
+    if author is not None:
+        context['author'] = author
+        context['following'] = (
+            request.user.is_authenticated
+            and Follow.objects.filter(
+                user=request.user, author=author).exists()
+        )
+        templates['follow'] = 'posts/fragments/follow.html'
+        if request.user.is_authenticated:
+            context['suggestions'] = suggested_authors(request.user)
+            templates['suggestions'] = 'posts/includes/suggestions.html'
+    post_id = request.GET.get('post', '')
+    post = None
+    if post_id.isdigit():
+        post = Post.objects.filter(pk=post_id).only('pk', 'author').first()
+    if post is not None:
+        context['post'] = post
+        context['liked'] = (
+            request.user.is_authenticated
+            and Like.objects.filter(user=request.user, post=post).exists()
+        )
+        context['form'] = CommentForm(
+            initial={'parent': request.GET.get('reply_to')})
+        templates['like'] = 'posts/fragments/like.html'
+        templates['edit'] = 'posts/fragments/edit.html'
+        templates['comment_form'] = 'posts/fragments/comment_form.html'
+    return JsonResponse({
+        name: render_to_string(template, context, request)
+        for name, template in templates.items()
+    })
 
 
 @login_required
 def post_create(request):
-    groups = Group.objects.all()
-    form = PostForm(request.POST, files=request.FILES or None)
+    form = PostForm(
+        request.POST, files=request.FILES or None, user=request.user)
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        form.instance.author = request.user
+        form.save()
         return redirect('posts:profile', request.user.username)
     context = {
         'form': form,
         'title': 'Новый пост',
-        'groups': groups
     }
     return render(request, 'posts/create_post.html', context)
 
@@ -94,7 +195,8 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        user=request.user
     )
     if form.is_valid():
         form.save()
@@ -116,20 +218,51 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        if comment.parent and comment.parent.post_id != post.id:
+            comment.parent = None
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def read_cursor(user, page_obj):
+    """
+    Прошлый курсор ленты подписок или None при первом визите.
+    Первая страница сдвигает курсор на самый свежий пост
+    и обнуляет счетчик непрочитанных.
+    """
+    cursor, created = FeedCursor.objects.get_or_create(user=user)
+    if page_obj.number == 1:
+        newest = max(page_ids(page_obj), default=0)
+        FeedCursor.objects.filter(pk=cursor.pk).update(
+            last_seen=max(newest, cursor.last_seen), unread=0)
+    return None if created else cursor.last_seen
+
+
+def mark_unread(posts, last_seen):
+    """Отмечает посты новее прошлого визита."""
+    for post in posts:
+        post.unread = last_seen is not None and post.pk > last_seen
+        yield post
+
+
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user).select_related('author','group')
+    posts = Post.objects.filter(
+        author__following__user=request.user
+    ).select_related('author').defer('text')
     paginator = Paginator(posts, POSTS_IN_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    last_seen = read_cursor(request.user, page_obj)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'live': live_url(page_obj, feed='follow'),
+        'suggestions': suggested_authors(request.user),
     }
-    return render(request, 'posts/follow.html', context)
+    return stream_page(
+        request, 'posts/follow.html', context, 'follow',
+        mark_unread(iterate_posts(page_obj), last_seen)
+    )
 
 
 @login_required
@@ -137,6 +270,7 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
+        Suggestion.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username)
 
 
@@ -150,3 +284,135 @@ def profile_unfollow(request, username):
     if follower.exists():
         follower.delete()
     return redirect('posts:profile', username)
+
+
+@require_POST
+@login_required
+def post_like(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    like(request.user, post)
+    return redirect('posts:post_detail', post_id=post_id)
+
+
+@require_POST
+@login_required
+def post_unlike(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    unlike(request.user, post)
+    return redirect('posts:post_detail', post_id=post_id)
+
+
+def upload_state(upload):
+    return JsonResponse({
+        'token': str(upload.token),
+        'size': upload.size,
+        'received': upload.received,
+        'completed': upload.completed,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+    })
+
+
+@login_required
+def upload_start(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Только POST'}, status=405)
+    try:
+        upload = start_upload(
+            request.user,
+            request.POST.get('filename', ''),
+            int(request.POST.get('size', 0))
+        )
+    except (UploadError, ValueError) as error:
+        return JsonResponse(
+            {'error': str(error)}, status=getattr(error, 'status', 400))
+    return upload_state(upload)
+
+
+@login_required
+def upload_chunk(request, token):
+    upload = get_object_or_404(Upload, token=token, user=request.user)
+    if request.method == 'GET':
+        return upload_state(upload)
+    try:
+        upload = write_chunk(
+            upload,
+            int(request.GET.get('offset', 0)),
+            request,
+            int(request.META.get('CONTENT_LENGTH') or 0)
+        )
+    except (UploadError, ValueError) as error:
+        return JsonResponse(
+            {'error': str(error)}, status=getattr(error, 'status', 400))
+    return upload_state(upload)
+
+
+@login_required
+def upload_complete(request, token):
+    upload = get_object_or_404(Upload, token=token, user=request.user)
+    try:
+        upload = complete_upload(upload, request.POST.get('sha256', ''))
+    except UploadError as error:
+        return JsonResponse({'error': str(error)}, status=error.status)
+    return upload_state(upload)
+
+
+@public_page
+def autocomplete(request, kind):
+    """Подсказки по префиксу имени пользователя или группы."""
+    index = indexes.get(kind)
+    if index is None:
+        raise Http404
+    query = request.GET.get('term', request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [
+            {'id': value, 'text': label}
+            for value, label in index.search(
+                query, settings.AUTOCOMPLETE_LIMIT)
+        ],
+        'pagination': {'more': False},
+    })
+
+
+def published(request, name, content_type):
+    """
+    Отдает собранный файл с ETag. БД нужна, только если файл
+    помечен устаревшим, так что обходы роботов ее не нагружают.
+    """
+    path = feeds.refresh(name)
+    if path is None:
+        raise Http404
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={CACHE_TIME}'
+    return response
+
+
+def sitemap(request):
+    return published(request, 'sitemap', 'application/xml')
+
+
+def sitemap_pages(request):
+    return published(request, 'sitemap-pages', 'application/xml')
+
+
+def sitemap_shard(request, shard):
+    return published(request, f'sitemap-{shard}', 'application/xml')
+
+
+def feed(request):
+    return published(request, 'feed', 'application/atom+xml')
+
+
+def group_feed(request, slug):
+    return published(
+        request, f'feed-group-{slug}', 'application/atom+xml')
+
+
+def author_feed(request, username):
+    return published(
+        request, f'feed-author-{username}', 'application/atom+xml')
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from core import invalidation
+
+
+def user_cache_key(user_id):
+    return f'users:user:{user_id}'
+
+
+def user_stamp(user_id):
+    return f'user-{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Достает пользователя сессии из кэша, чтобы не ходить
+    в auth_user на каждом запросе.
+    Кэш у каждого процесса свой, поэтому запись хранится вместе
+    с версией метки пользователя: сохранение или удаление
+    пользователя в любом процессе меняет метку, и устаревшая
+    запись перечитывается из базы.
+    """
+    cache = cache
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        version = invalidation.version(user_stamp(user_id))
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        user = super().get_user(user_id)
+        if user is not None:
+            self.cache.set(key, (version, user), settings.USER_CACHE_TIME)
+        return user
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core import invalidation
+from users.backends import user_cache_key, user_stamp
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+    # Остальные процессы узнают об изменении по метке после коммита
+    stamp = user_stamp(instance.pk)
+    transaction.on_commit(lambda: invalidation.bump(stamp))
@@ -0,0 +1,86 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.test import (TestCase, TransactionTestCase, Client,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from users.backends import CachedModelBackend, user_cache_key
+
+User = get_user_model()
+
+
+class CachedAuthTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Nikita')
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        client = Client()
+        client.force_login(CachedAuthTests.user)
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        return len(queries)
+
+    def test_cached_auth_saves_queries(self):
+        """
+        Кэшированные сессия и пользователь экономят
+        два запроса на каждой странице
+        """
+        url = reverse('posts:follow_index')
+        with override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+            AUTHENTICATION_BACKENDS=[
+                'django.contrib.auth.backends.ModelBackend'
+            ]
+        ):
+            before = self.count_queries(url)
+        after = self.count_queries(url)
+        self.assertEqual(after, before - 2)
+
+    def test_user_cache_invalidated_on_save(self):
+        """Смена пароля сбрасывает пользователя в кэше"""
+        client = Client()
+        client.force_login(CachedAuthTests.user)
+        client.get(reverse('posts:follow_index'))
+        key = user_cache_key(CachedAuthTests.user.pk)
+        self.assertIsNotNone(cache.get(key))
+        user = User.objects.get(pk=CachedAuthTests.user.pk)
+        user.set_password('new-password-123')
+        user.save()
+        self.assertIsNone(cache.get(key))
+
+    def test_session_flush_is_seen_by_other_processes(self):
+        """Сессии лежат в общем кеше: выход виден другому воркеру"""
+        options = settings.CACHES[settings.SESSION_CACHE_ALIAS]
+        other = FileBasedCache(options['LOCATION'], {})
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store['value'] = 1
+        store.save()
+        key = store.cache_key
+        self.assertEqual(other.get(key), {'value': 1})
+        store.flush()
+        self.assertIsNone(other.get(key))
+
+
+class CrossProcessUserCacheTests(TransactionTestCase):
+    def test_invalidation_reaches_other_process_cache(self):
+        """Деактивация сбрасывает пользователя и в кеше другого процесса"""
+        user = User.objects.create_user(username='worker')
+        other = CachedModelBackend()
+        other.cache = LocMemCache('other-process', {})
+        self.assertEqual(other.get_user(user.pk), user)
+        self.assertIsNotNone(other.cache.get(user_cache_key(user.pk)))
+        user.is_active = False
+        user.save()
+        self.assertIsNone(other.get_user(user.pk))
@@ -0,0 +1,17 @@
+"""
+ASGI config for yatube project.
+
+Serves only live notifications about new posts (posts.live): a single
+process keeps the idle SSE and long-poll connections, while the rest of
+the site stays on WSGI. Run it with any ASGI server, e.g.
+``uvicorn yatube.asgi:application``, and proxy LIVE_URL to it.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup()
+
+from posts.live import application  # noqa: E402,F401
@@ -10,11 +10,23 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Служебные файлы процессов: метки, метрики, ленты, общий кеш.
+# Тесты пишут их во временный каталог, а не в дерево проекта
+RUNTIME_DIR = BASE_DIR
+if sys.argv[1:2] == ['test']:
+    RUNTIME_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, RUNTIME_DIR, True)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -57,13 +69,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.compression.CompressionMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -83,11 +100,30 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.unread.unread',
             ],
         },
     },
 ]
 
+# Необязательный Jinja2 для страниц лент и поста: включается
+# POSTS_TEMPLATE_ENGINE = 'jinja2', если пакет jinja2 установлен
+JINJA2_DIR = os.path.join(BASE_DIR, 'jinja2')
+
+if find_spec('jinja2') is not None:
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [JINJA2_DIR],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'core.jinja.environment',
+            'context_processors': (
+                TEMPLATES[0]['OPTIONS']['context_processors']),
+        },
+    })
+
+POSTS_TEMPLATE_ENGINE = 'django'
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -142,6 +178,11 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# collectstatic: имена с хешем содержимого и сжатые .gz/.br рядом
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -152,6 +193,19 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_IN_PAGE = 10
 
+COMMENT_THREADS_IN_PAGE = 20
+
+COMMENT_MAX_DEPTH = 5
+
+# Имя url: (частота, ограничиваемые методы)
+RATELIMITS = {
+    'posts:post_create': ('10/m', ('POST',)),
+    'posts:add_comment': ('20/m', ('POST',)),
+    'posts:profile_follow': ('30/m', ('GET', 'POST')),
+    'posts:post_like': ('60/m', ('POST',)),
+    'users:signup': ('5/h', ('POST',)),
+}
+
 CACHE_TIME = 20
 
 CORE_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -160,8 +214,115 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+CHUNKED_UPLOAD_DIR = os.path.join(RUNTIME_DIR, 'uploads')
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+UPLOAD_EXPIRE_TIME = 60 * 60 * 24
+
+# Картинки постов лежат под хэшем содержимого и никогда не меняются
+IMMUTABLE_CACHE_TIME = 60 * 60 * 24 * 365
+
+POST_IMAGE_SIZE = (960, 339)
+
+POST_IMAGE_WIDTHS = (320, 640, 960)
+
+POST_IMAGE_SIZES = '(min-width: 768px) 720px, 100vw'
+
+# Файлы-метки, по которым процессы узнают об изменении общих данных
+INVALIDATION_DIR = os.path.join(RUNTIME_DIR, 'invalidation')
+
+# Live-уведомления о новых постах (yatube/asgi.py)
+LIVE_URL = '/live/'
+LIVE_SOCKET = os.path.join(RUNTIME_DIR, 'live.sock')
+LIVE_KEEPALIVE = 15
+LIVE_POLL_TIMEOUT = 25
+
+# Sitemap и Atom-ленты: файлы пересобираются по меткам изменений
+PUBLISH_DIR = os.path.join(RUNTIME_DIR, 'published')
+SITE_URL = 'http://127.0.0.1:8000'
+SITEMAP_SHARD_SIZE = 1000
+FEED_SIZE = 20
+
+# Сколько подсказок отдает автодополнение
+AUTOCOMPLETE_LIMIT = 10
+
+# Сколько самых больших групп рендерится при прогреве (core/warmup.py)
+WARMUP_GROUPS = 5
+
+# Рекомендаций авторов на пользователя (build_suggestions)
+SUGGESTIONS_COUNT = 5
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.metrics.InstrumentedLocMemCache',
+    },
+    # Общий для всех процессов кеш: то, что не должно расходиться
+    # между воркерами. На нескольких серверах - memcached или redis
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(RUNTIME_DIR, 'shared_cache'),
+    },
+}
+
+# Корзины ограничения частоты запросов, общие для всех воркеров
+RATELIMIT_DIR = os.path.join(RUNTIME_DIR, 'ratelimit')
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Выход и сброс сессии должны сразу быть видны всем воркерам
+SESSION_CACHE_ALIAS = 'shared'
+
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+
+USER_CACHE_TIME = 60 * 5
+
+PROFILING_DIR = os.path.join(RUNTIME_DIR, 'profiles')
+
+PROFILING_PARAM = 'profile'
+
+PROFILING_SAMPLE_RATE = 0
+
+PROFILING_MAX_FILES = 100
+
+METRICS_DIR = os.path.join(RUNTIME_DIR, 'metrics')
+
+METRICS_NAMESPACES = ('posts', 'users')
+
+METRICS_FLUSH_INTERVAL = 5
+
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+THUMBNAIL_BACKEND = 'core.metrics.TimedThumbnailBackend'
+
+SLOW_QUERY_THRESHOLD = 0.1
+
+SLOW_QUERY_LOG = os.path.join(RUNTIME_DIR, 'slow_queries.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
@@ -17,13 +17,23 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import metrics, ready, serve_media, serve_static
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('admin/', include('core.urls', namespace='core')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics', metrics, name='metrics'),
+    path('ready', ready, name='ready'),
+    # Статику обычно раздает веб-сервер, сюда запросы доходят без него
+    path(
+        f'{settings.STATIC_URL.strip("/")}/<path:path>',
+        serve_static,
+        name='static'
+    ),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -36,5 +46,7 @@ if settings.DEBUG:
     import debug_toolbar
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),) 
     urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+        settings.MEDIA_URL,
+        view=serve_media,
+        document_root=settings.MEDIA_ROOT
     )
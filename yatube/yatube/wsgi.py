@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Прогрев в фоне: до его конца /ready отвечает 503
+from core import warmup  # noqa: E402
+
+warmup.start()